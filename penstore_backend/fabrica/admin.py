@@ -1,4 +1,5 @@
 from django.contrib import admin
+from loja.tarefas import agendar
 from .models import (
     Fornecedor, 
     Insumo, 
@@ -12,7 +13,12 @@ from .models import (
     ControleQualidade,
     Venda, 
     FluxoCaixa,
-    ComposicaoProduto
+    ComposicaoProduto,
+    SnapshotEstoqueProduto,
+    SnapshotEstoqueInsumo,
+    CustoEstocagemProduto,
+    ResumoFluxoCaixa,
+    SaldoCaixaDiario
 )
 
 @admin.register(Fornecedor)
@@ -22,9 +28,10 @@ class FornecedorAdmin(admin.ModelAdmin):
 
 @admin.register(Insumo)
 class InsumoAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'codigo', 'fornecedor', 'estoque_minimo', 'quantidade_estoque', 'unidade_medida') 
+    list_display = ('nome', 'codigo', 'fornecedor', 'estoque_minimo', 'quantidade_estoque', 'unidade_medida', 'custo_unitario', 'custo_medio') 
     list_filter = ('fornecedor', 'unidade_medida')
     search_fields = ('nome', 'codigo')
+    readonly_fields = ('quantidade_estoque', 'custo_medio')
     
 @admin.register(LogEstoqueDiario)
 class LogEstoqueDiarioAdmin(admin.ModelAdmin):
@@ -61,6 +68,12 @@ class PedidoCompraAdmin(admin.ModelAdmin):
     list_filter = ('status', 'data_pedido', 'fornecedor')
     search_fields = ('fornecedor__nome',)
     inlines = [ItemPedidoCompraInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Itens incluídos em um pedido já recebido não passam pelo post_save do pedido
+        if form.instance.status == 'RECEBIDO_TOTAL' and any(formset.has_changed() for formset in formsets):
+            agendar('fabrica.receber_pedido_compra', {'pedido_compra_id': form.instance.id})
     
 @admin.register(OrdemProducao)
 class OrdemProducaoAdmin(admin.ModelAdmin):
@@ -105,4 +118,38 @@ class ComposicaoProdutoAdmin(admin.ModelAdmin):
     list_display = ('produto', 'insumo', 'quantidade_necessaria')
     list_filter = ('produto',)
     search_fields = ('produto__nome', 'insumo__nome')
-    raw_id_fields = ('produto', 'insumo')
\ No newline at end of file
+    raw_id_fields = ('produto', 'insumo')
+
+@admin.register(SnapshotEstoqueProduto)
+class SnapshotEstoqueProdutoAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'data_corte', 'quantidade')
+    list_filter = ('data_corte',)
+    search_fields = ('produto__nome',)
+    raw_id_fields = ('produto',)
+
+@admin.register(SnapshotEstoqueInsumo)
+class SnapshotEstoqueInsumoAdmin(admin.ModelAdmin):
+    list_display = ('insumo', 'data_corte', 'quantidade')
+    list_filter = ('data_corte',)
+    search_fields = ('insumo__nome',)
+    raw_id_fields = ('insumo',)
+
+@admin.register(CustoEstocagemProduto)
+class CustoEstocagemProdutoAdmin(admin.ModelAdmin):
+    list_display = ('data', 'produto', 'quantidade', 'custo_unitario', 'valor')
+    list_filter = ('data',)
+    search_fields = ('produto__nome',)
+    raw_id_fields = ('produto',)
+
+@admin.register(ResumoFluxoCaixa)
+class ResumoFluxoCaixaAdmin(admin.ModelAdmin):
+    list_display = ('data', 'categoria', 'entradas', 'saidas', 'lancamentos')
+    list_filter = ('categoria', 'data')
+
+@admin.register(SaldoCaixaDiario)
+class SaldoCaixaDiarioAdmin(admin.ModelAdmin):
+    list_display = ('data', 'saldo')
+    date_hierarchy = 'data'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).exclude(data=SaldoCaixaDiario.DATA_TRAVA)
@@ -6,4 +6,5 @@ class FabricaConfig(AppConfig):
     name = 'fabrica'
 
     def ready(self):
-        import fabrica.signals
\ No newline at end of file
+        import fabrica.signals
+        import fabrica.tarefas
\ No newline at end of file
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .estoque import SALDO_MOVIMENTOS, saldos_produtos
+from .models import CustoEstocagemProduto, FluxoCaixa, MovimentoProdutoAcabado
+
+REFERENCIA_CUSTO_ESTOCAGEM = 'CustoEstocagem'
+
+
+class CustosJaProcessados(Exception):
+    pass
+
+
+def _referencia_dia(dia):
+    # AAAAMMDD: um lançamento por dia, garantido pela constraint única de referência do FluxoCaixa
+    return int(dia.strftime('%Y%m%d'))
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _itens_do_dia(dia, saldos):
+    return [
+        CustoEstocagemProduto(
+            data=dia,
+            produto_id=produto_id,
+            quantidade=quantidade,
+            custo_unitario=settings.CUSTO_ESTOCAGEM_UNITARIO,
+            valor=quantidade * settings.CUSTO_ESTOCAGEM_UNITARIO,
+        )
+        for produto_id, quantidade in sorted(saldos.items())
+        if quantidade > 0
+    ]
+
+
+def _lancamento_do_dia(dia, itens):
+    return FluxoCaixa(
+        tipo='SAIDA',
+        categoria='DEPRECIACAO',
+        descricao=f"Custo Diário de Estocagem ({dia})",
+        valor=sum(item.valor for item in itens),
+        data_lancamento=dia,
+        referencia_tabela=REFERENCIA_CUSTO_ESTOCAGEM,
+        referencia_id=_referencia_dia(dia)
+    )
+
+
+def _dias_processados(inicio, fim):
+    # Lançamentos anteriores a esta rotina não têm referência; são reconhecidos pela descrição
+    return set(FluxoCaixa.objects.filter(
+        categoria='DEPRECIACAO', data_lancamento__range=(inicio, fim), descricao__startswith="Custo Diário de Estocagem"
+    ).values_list('data_lancamento', flat=True))
+
+
+def _gravar_dias(saldos_por_dia):
+    """Lança os dias {dia: saldos} em um savepoint (um INSERT em lote por tabela); retorna {dia: total}."""
+    lancamentos, itens = [], []
+    for dia, saldos in saldos_por_dia.items():
+        itens_dia = _itens_do_dia(dia, saldos)
+        lancamentos.append(_lancamento_do_dia(dia, itens_dia))
+        itens.extend(itens_dia)
+    with transaction.atomic():
+        FluxoCaixa.objects.registrar_em_lote(lancamentos)
+        CustoEstocagemProduto.objects.bulk_create(itens)
+    return {lancamento.data_lancamento: lancamento.valor for lancamento in lancamentos}
+
+
+def processar_custo_estocagem(dia=None):
+    """
+    Calcula o custo de estocagem do dia a partir do saldo de produtos acabados (snapshot + um agregado
+    agrupado sobre MovimentoProdutoAcabado), lança o total no FluxoCaixa e grava o detalhamento por
+    produto em CustoEstocagemProduto. Retorna os itens gravados; levanta CustosJaProcessados se o dia
+    já tiver lançamento.
+    """
+    agora = timezone.now()
+    dia = dia or timezone.localdate(agora)
+    itens = _itens_do_dia(dia, saldos_produtos(min(agora, _inicio_do_dia(dia + timedelta(days=1)))))
+
+    with transaction.atomic():
+        if _dias_processados(dia, dia):
+            raise CustosJaProcessados(dia)
+        if not itens:
+            return []
+        try:
+            with transaction.atomic():
+                _lancamento_do_dia(dia, itens).save()
+        except IntegrityError:
+            raise CustosJaProcessados(dia)
+        CustoEstocagemProduto.objects.bulk_create(itens)
+    return itens
+
+
+def processar_custos_periodo(inicio, fim):
+    """
+    Recupera os dias sem lançamento entre `inicio` e `fim` (inclusive) em uma passada: saldo de abertura
+    via saldos_produtos, um único agregado dos movimentos agrupado por (dia, produto) e soma acumulada
+    em memória. Dias já processados são pulados; retorna {dia: total} dos dias lançados.
+    """
+    saldos = defaultdict(int, saldos_produtos(_inicio_do_dia(inicio)))
+    deltas_por_dia = defaultdict(list)
+    deltas = MovimentoProdutoAcabado.objects.filter(
+        data_hora__gte=_inicio_do_dia(inicio), data_hora__lt=_inicio_do_dia(fim + timedelta(days=1))
+    ).annotate(dia=TruncDate('data_hora')).values('dia', 'produto_id').annotate(
+        saldo=SALDO_MOVIMENTOS
+    ).values_list('dia', 'produto_id', 'saldo')
+    for dia, produto_id, saldo in deltas:
+        deltas_por_dia[dia].append((produto_id, saldo or 0))
+
+    with transaction.atomic():
+        processados = _dias_processados(inicio, fim)
+        pendentes = {}
+        dia = inicio
+        while dia <= fim:
+            for produto_id, saldo in deltas_por_dia.get(dia, ()):
+                saldos[produto_id] += saldo
+            if dia not in processados:
+                em_estoque = {produto_id: quantidade for produto_id, quantidade in saldos.items() if quantidade > 0}
+                if em_estoque:
+                    pendentes[dia] = em_estoque
+            dia += timedelta(days=1)
+
+        try:
+            return _gravar_dias(pendentes)
+        except IntegrityError:
+            # Uma execução concorrente lançou algum dia do período: grava dia a dia e pula os já lançados
+            lancados = {}
+            for dia, em_estoque in pendentes.items():
+                try:
+                    lancados.update(_gravar_dias({dia: em_estoque}))
+                except IntegrityError:
+                    continue
+            return lancados
+
+
+def detalhamento_custo_estocagem(dia):
+    return CustoEstocagemProduto.objects.filter(data=dia).select_related('produto').order_by('produto__nome')
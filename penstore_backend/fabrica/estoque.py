@@ -0,0 +1,125 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    LogEstoqueDiario, MovimentoInsumo, MovimentoProdutoAcabado,
+    SnapshotEstoqueInsumo, SnapshotEstoqueProduto
+)
+
+SALDO_MOVIMENTOS = Sum(Case(
+    When(tipo='ENTRADA', then=F('quantidade')),
+    When(tipo='SAIDA', then=-F('quantidade')),
+    default=0,
+    output_field=IntegerField(),
+))
+
+
+def _saldos(modelo_movimento, modelo_snapshot, campo, ate, ids):
+    """
+    Saldo de cada item em `ate` (movimentos com data_hora < ate): parte do snapshot mais recente
+    com data_corte <= ate e soma apenas os movimentos posteriores ao corte.
+    """
+    ate = ate or timezone.now()
+    chave = f'{campo}_id'
+
+    snapshots = modelo_snapshot.objects.filter(data_corte__lte=ate)
+    movimentos = modelo_movimento.objects.filter(data_hora__lt=ate)
+    if ids is not None:
+        snapshots = snapshots.filter(**{f'{chave}__in': ids})
+        movimentos = movimentos.filter(**{f'{chave}__in': ids})
+
+    ultimo_corte = modelo_snapshot.objects.filter(
+        **{campo: OuterRef(campo)}, data_corte__lte=ate
+    ).order_by('-data_corte').values('pk')[:1]
+    snapshots = snapshots.filter(pk=Subquery(ultimo_corte)).values_list(chave, 'data_corte', 'quantidade')
+
+    saldos = {}
+    itens_por_corte = defaultdict(list)
+    for item_id, data_corte, quantidade in snapshots:
+        saldos[item_id] = quantidade
+        itens_por_corte[data_corte].append(item_id)
+
+    for data_corte, itens in itens_por_corte.items():
+        deltas = movimentos.filter(**{f'{chave}__in': itens}, data_hora__gte=data_corte).values(chave).annotate(
+            saldo=SALDO_MOVIMENTOS
+        ).values_list(chave, 'saldo')
+        for item_id, saldo in deltas:
+            saldos[item_id] += saldo or 0
+
+    sem_snapshot = movimentos.exclude(**{f'{chave}__in': list(saldos)}).values(chave).annotate(
+        saldo=SALDO_MOVIMENTOS
+    ).values_list(chave, 'saldo')
+    for item_id, saldo in sem_snapshot:
+        saldos[item_id] = saldo or 0
+
+    return saldos
+
+
+def saldos_produtos(ate=None, produto_ids=None):
+    return _saldos(MovimentoProdutoAcabado, SnapshotEstoqueProduto, 'produto', ate, produto_ids)
+
+
+def saldos_insumos(ate=None, insumo_ids=None):
+    return _saldos(MovimentoInsumo, SnapshotEstoqueInsumo, 'insumo', ate, insumo_ids)
+
+
+def gerar_logs_estoque(inicio, fim, substituir=False):
+    """
+    Gera LogEstoqueDiario por (insumo, dia) entre `inicio` e `fim` (inclusive): saldo de abertura via
+    saldos_insumos, um único agregado de MovimentoInsumo agrupado por (dia, insumo) e encadeamento
+    abertura -> fechamento em memória. Insumos sem saldo e sem movimento no dia não geram linha.
+    Com `substituir`, as linhas existentes no período são refeitas. Retorna quantas linhas foram gravadas.
+    """
+    def inicio_do_dia(dia):
+        return timezone.make_aware(datetime.combine(dia, time.min))
+
+    saldos = defaultdict(int, saldos_insumos(inicio_do_dia(inicio)))
+    resumos_por_dia = defaultdict(list)
+    resumos = MovimentoInsumo.objects.filter(
+        data_hora__gte=inicio_do_dia(inicio), data_hora__lt=inicio_do_dia(fim + timedelta(days=1))
+    ).annotate(dia=TruncDate('data_hora')).values('dia', 'insumo_id').annotate(
+        entradas=Count('id', filter=Q(tipo='ENTRADA')),
+        saidas=Count('id', filter=Q(tipo='SAIDA')),
+        quantidade_entrada=Sum('quantidade', filter=Q(tipo='ENTRADA'), default=0),
+        quantidade_saida=Sum('quantidade', filter=Q(tipo='SAIDA'), default=0),
+    ).values_list('dia', 'insumo_id', 'entradas', 'saidas', 'quantidade_entrada', 'quantidade_saida')
+    for dia, insumo_id, *resumo in resumos:
+        resumos_por_dia[dia].append((insumo_id, resumo))
+
+    logs = []
+    dia = inicio
+    while dia <= fim:
+        movimentados = {}
+        for insumo_id, (entradas, saidas, quantidade_entrada, quantidade_saida) in resumos_por_dia.get(dia, ()):
+            movimentados[insumo_id] = {
+                'entradas': entradas, 'saidas': saidas,
+                'quantidade_entrada': quantidade_entrada, 'quantidade_saida': quantidade_saida,
+            }
+        for insumo_id in sorted(set(saldos) | set(movimentados)):
+            resumo = movimentados.get(insumo_id, {})
+            abertura = saldos[insumo_id]
+            fechamento = abertura + resumo.get('quantidade_entrada', 0) - resumo.get('quantidade_saida', 0)
+            saldos[insumo_id] = fechamento
+            if not abertura and not fechamento and not resumo:
+                continue
+            logs.append(LogEstoqueDiario(
+                insumo_id=insumo_id,
+                data=dia,
+                quantidade_inicial=abertura,
+                quantidade_final=fechamento,
+                custo_estocagem_dia=max(fechamento, 0) * settings.CUSTO_ESTOCAGEM_UNITARIO,
+                movimentos=resumo,
+            ))
+        dia += timedelta(days=1)
+
+    with transaction.atomic():
+        if substituir:
+            LogEstoqueDiario.objects.filter(data__range=(inicio, fim)).delete()
+        LogEstoqueDiario.objects.bulk_create(logs, ignore_conflicts=not substituir)
+    return len(logs)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from django.db import connection
+
+logger = logging.getLogger('fabrica.instrumentacao')
+
+# Limites superiores (ms) das faixas do histograma; a última faixa acumula tudo acima de 2,5s
+LIMITES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_histogramas = {}
+_trava = threading.Lock()
+
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def _id_instancia(kwargs):
+    instance = kwargs.get('instance')
+    if instance is not None:
+        return instance.pk
+    return next((valor for nome, valor in kwargs.items() if nome.endswith('_id')), None)
+
+
+def _registrar(nome, duracao_ms, consultas, falhou):
+    with _trava:
+        dados = _histogramas.get(nome)
+        if dados is None:
+            dados = _histogramas[nome] = {
+                'chamadas': 0, 'erros': 0, 'duracao_total_ms': 0.0, 'duracao_max_ms': 0.0,
+                'consultas_total': 0, 'faixas': [0] * (len(LIMITES_MS) + 1),
+            }
+        dados['chamadas'] += 1
+        dados['erros'] += falhou
+        dados['duracao_total_ms'] += duracao_ms
+        dados['duracao_max_ms'] = max(dados['duracao_max_ms'], duracao_ms)
+        dados['consultas_total'] += consultas
+        dados['faixas'][bisect_left(LIMITES_MS, duracao_ms)] += 1
+
+
+def instrumentado(funcao):
+    """
+    Mede duração e número de consultas de um handler (signal ou tarefa) e alimenta o histograma em memória
+    do processo, que é o sinal padrão. O registro por chamada sai em DEBUG (FABRICA_LOG_LEVEL=DEBUG), para não
+    escrever no console a cada save; falhas saem em WARNING, sem traceback, porque muitas são reexecutadas
+    (ex: banco travado). Quem chama decide se a falha é definitiva: processar_tarefas registra em ERROR
+    quando desiste da tarefa. Use abaixo do @receiver / @tarefa.
+    """
+    nome = f'{funcao.__module__}.{funcao.__name__}'
+
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            with connection.execute_wrapper(contador):
+                return funcao(*args, **kwargs)
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            _registrar(nome, duracao_ms, contador.total, erro is not None)
+            nivel = logging.WARNING if erro is not None else logging.DEBUG
+            if logger.isEnabledFor(nivel):
+                instancia_id = _id_instancia(kwargs)
+                logger.log(
+                    nivel,
+                    'handler=%s instancia_id=%s duracao_ms=%.1f consultas=%d%s',
+                    nome, instancia_id, duracao_ms, contador.total,
+                    f' erro={erro!r}' if erro is not None else '',
+                    extra={
+                        'handler': nome,
+                        'instancia_id': instancia_id,
+                        'duracao_ms': round(duracao_ms, 3),
+                        'consultas': contador.total,
+                    },
+                )
+    return executar
+
+
+def histogramas():
+    """Retrato do histograma de cada handler desde o início do processo."""
+    with _trava:
+        retrato = {}
+        for nome, dados in _histogramas.items():
+            faixas = [f'<={limite}ms' for limite in LIMITES_MS] + [f'>{LIMITES_MS[-1]}ms']
+            retrato[nome] = {
+                'chamadas': dados['chamadas'],
+                'erros': dados['erros'],
+                'duracao_media_ms': round(dados['duracao_total_ms'] / dados['chamadas'], 3),
+                'duracao_max_ms': round(dados['duracao_max_ms'], 3),
+                'consultas_media': round(dados['consultas_total'] / dados['chamadas'], 2),
+                'histograma_ms': dict(zip(faixas, dados['faixas'])),
+            }
+        return retrato
+
+
+def zerar_histogramas():
+    with _trava:
+        _histogramas.clear()
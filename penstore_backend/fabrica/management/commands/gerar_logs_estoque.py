@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from fabrica.estoque import gerar_logs_estoque
+from fabrica.models import LogEstoqueDiario, MovimentoInsumo
+
+class Command(BaseCommand):
+    help = 'Preenche LogEstoqueDiario (abertura, fechamento, custo e resumo dos movimentos por insumo e dia) a partir de MovimentoInsumo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='de', type=date.fromisoformat,
+                            help='Primeiro dia (AAAA-MM-DD). Padrão: dia do primeiro movimento de insumo.')
+        parser.add_argument('--to', dest='ate', type=date.fromisoformat,
+                            help='Último dia (AAAA-MM-DD). Padrão: ontem, o último dia fechado.')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Gera apenas os dias posteriores ao último log gravado, sem refazer os existentes.')
+
+    def handle(self, *args, **options):
+        fim = options['ate'] or timezone.localdate() - timedelta(days=1)
+
+        if options['incremental']:
+            if options['de']:
+                raise CommandError('--incremental calcula o início sozinho; não use junto com --from.')
+            ultimo = LogEstoqueDiario.objects.aggregate(ultimo=Max('data'))['ultimo']
+            inicio = ultimo + timedelta(days=1) if ultimo else None
+        else:
+            inicio = options['de']
+
+        if inicio is None:
+            primeiro = MovimentoInsumo.objects.aggregate(primeiro=Min('data_hora'))['primeiro']
+            if primeiro is None:
+                self.stdout.write(self.style.SUCCESS("Nenhum movimento de insumo. Nada a gerar."))
+                return
+            inicio = timezone.localtime(primeiro).date()
+
+        if inicio > fim:
+            self.stdout.write(self.style.SUCCESS(f"Logs já estão em dia até {fim}."))
+            return
+
+        self.stdout.write(f"--- Gerando logs de estoque de {inicio} a {fim} ---")
+        gravados = gerar_logs_estoque(inicio, fim, substituir=not options['incremental'])
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: {gravados} logs gravados."))
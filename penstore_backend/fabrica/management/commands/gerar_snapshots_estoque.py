@@ -0,0 +1,51 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from fabrica.estoque import saldos_insumos, saldos_produtos
+from fabrica.models import SnapshotEstoqueInsumo, SnapshotEstoqueProduto
+
+class Command(BaseCommand):
+    help = 'Grava snapshots de saldo de produtos e insumos em uma data de corte, para que as consultas de estoque só somem os movimentos posteriores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-corte',
+            help='Instante do corte (ISO 8601). Padrão: a meia-noite mais recente que já passou da folga '
+                 '(ESTOQUE_SNAPSHOT_FOLGA), ou seja, o fechamento de ontem.'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - settings.ESTOQUE_SNAPSHOT_FOLGA
+        if options['data_corte']:
+            data_corte = parse_datetime(options['data_corte'])
+            if data_corte is None:
+                raise CommandError("Data de corte inválida. Use o formato ISO 8601, ex: 2025-11-30T00:00:00.")
+            if timezone.is_naive(data_corte):
+                data_corte = timezone.make_aware(data_corte)
+        else:
+            data_corte = timezone.make_aware(datetime.combine(timezone.localdate(limite), time.min))
+
+        # Um movimento com data_hora anterior ao corte mas gravado depois do snapshot ficaria fora dele
+        if data_corte > limite:
+            minutos = int(settings.ESTOQUE_SNAPSHOT_FOLGA.total_seconds() // 60)
+            raise CommandError(f"A data de corte precisa estar ao menos {minutos} minutos no passado.")
+
+        self.stdout.write(f"--- Gerando snapshots de estoque em {data_corte} ---")
+
+        with transaction.atomic():
+            produtos = [
+                SnapshotEstoqueProduto(produto_id=produto_id, data_corte=data_corte, quantidade=saldo)
+                for produto_id, saldo in saldos_produtos(data_corte).items()
+            ]
+            insumos = [
+                SnapshotEstoqueInsumo(insumo_id=insumo_id, data_corte=data_corte, quantidade=saldo)
+                for insumo_id, saldo in saldos_insumos(data_corte).items()
+            ]
+            SnapshotEstoqueProduto.objects.bulk_create(produtos, ignore_conflicts=True)
+            SnapshotEstoqueInsumo.objects.bulk_create(insumos, ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: {len(produtos)} snapshots de produtos e {len(insumos)} de insumos gravados."))
@@ -1,45 +1,48 @@
-from django.core.management.base import BaseCommand
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from fabrica.models import FluxoCaixa
-from loja.models import Produto
+from fabrica.custos import (
+    CustosJaProcessados, detalhamento_custo_estocagem, processar_custo_estocagem, processar_custos_periodo
+)
 
 class Command(BaseCommand):
     help = 'Calcula e registra o custo de estocagem diário automaticamente. Ideal para rodar via Cron/Agendador.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='de', type=date.fromisoformat,
+                            help='Recupera os dias sem lançamento a partir desta data (AAAA-MM-DD).')
+        parser.add_argument('--to', dest='ate', type=date.fromisoformat,
+                            help='Último dia da recuperação (AAAA-MM-DD). Padrão: hoje.')
+
     def handle(self, *args, **options):
-        hoje = timezone.now().date()
+        hoje = timezone.localdate()
+
+        if options['de'] or options['ate']:
+            inicio = options['de'] or options['ate']
+            fim = options['ate'] or hoje
+            if inicio > fim:
+                raise CommandError('--from deve ser anterior ou igual a --to.')
+            self.stdout.write(f"--- Recuperando custos de {inicio} a {fim} ---")
+            lancados = processar_custos_periodo(inicio, fim)
+            for dia, total in sorted(lancados.items()):
+                self.stdout.write(f" - {dia}: R$ {total:.2f}")
+            self.stdout.write(self.style.SUCCESS(f"SUCESSO: {len(lancados)} dia(s) lançado(s)."))
+            return
         
         self.stdout.write(f"--- Iniciando rotina de custos para: {hoje} ---")
 
-        if FluxoCaixa.objects.filter(
-            categoria='DEPRECIACAO', 
-            data_lancamento=hoje, 
-            descricao__startswith="Custo Diário"
-        ).exists():
+        try:
+            itens = processar_custo_estocagem(hoje)
+        except CustosJaProcessados:
             self.stdout.write(self.style.WARNING(f"AVISO: Custos de {hoje} já foram processados. Abortando para evitar duplicidade."))
             return
 
-        produtos = Produto.objects.all()
-        total_custo = 0
-        itens_com_estoque = 0
-
-        for produto in produtos:
-            estoque = produto.estoque_atual
-            if estoque > 0:
-                custo_item = estoque * 0.02
-                total_custo += float(custo_item)
-                itens_com_estoque += 1
-                self.stdout.write(f" - {produto.nome}: {estoque} un -> R$ {custo_item:.2f}")
+        if not itens:
+            self.stdout.write(self.style.SUCCESS("Estoque zerado. Nenhum custo gerado hoje."))
+            return
 
-        if total_custo > 0:
-            FluxoCaixa.objects.create(
-                tipo='SAIDA',
-                categoria='DEPRECIACAO',
-                descricao=f"Custo Diário de Estocagem ({hoje})",
-                valor=total_custo,
-                data_lancamento=hoje,
-                referencia_tabela='RotinaAutomatica'
-            )
-            self.stdout.write(self.style.SUCCESS(f"SUCESSO: Lançamento de R$ {total_custo:.2f} criado."))
-        else:
-            self.stdout.write(self.style.SUCCESS("Estoque zerado. Nenhum custo gerado hoje."))
\ No newline at end of file
+        total_custo = 0
+        for item in detalhamento_custo_estocagem(hoje):
+            total_custo += item.valor
+            self.stdout.write(f" - {item.produto.nome}: {item.quantidade} un -> R$ {item.valor:.2f}")
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: Lançamento de R$ {total_custo:.2f} criado."))
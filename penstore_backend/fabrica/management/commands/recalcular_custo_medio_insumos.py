@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fabrica.models import Insumo, MovimentoInsumo, custo_medio_apos_entrada, delta_estoque
+
+class Command(BaseCommand):
+    help = (
+        'Refaz Insumo.custo_medio reproduzindo o histórico de MovimentoInsumo em ordem cronológica e '
+        'revalora as SAIDAs pelo custo médio vigente em cada uma.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manter-saidas', action='store_true', help='Não altera o custo gravado nas SAIDAs.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            insumos = {insumo.id: insumo for insumo in Insumo.objects.select_for_update().only('id', 'nome', 'custo_unitario', 'custo_medio')}
+            # Antes da primeira ENTRADA, o custo de tabela
+            estado = {insumo_id: [0, insumo.custo_unitario] for insumo_id, insumo in insumos.items()}
+            saidas = []
+            movimentos = MovimentoInsumo.objects.order_by('insumo_id', 'data_hora', 'id').values_list(
+                'id', 'insumo_id', 'tipo', 'quantidade', 'custo_unitario_movimento'
+            )
+            for movimento_id, insumo_id, tipo, quantidade, custo_unitario in movimentos.iterator(chunk_size=2000):
+                saldo_custo = estado[insumo_id]
+                if tipo == 'ENTRADA':
+                    saldo_custo[1] = custo_medio_apos_entrada(saldo_custo[0], saldo_custo[1], quantidade, quantidade * custo_unitario)
+                elif custo_unitario != saldo_custo[1]:
+                    saidas.append(MovimentoInsumo(id=movimento_id, custo_unitario_movimento=saldo_custo[1]))
+                saldo_custo[0] += delta_estoque(tipo, quantidade)
+
+            divergentes = []
+            for insumo_id, (_, custo_medio) in estado.items():
+                insumo = insumos[insumo_id]
+                if insumo.custo_medio != custo_medio:
+                    self.stdout.write(f" - {insumo.nome}: {insumo.custo_medio} -> {custo_medio}")
+                    insumo.custo_medio = custo_medio
+                    divergentes.append(insumo)
+            Insumo.objects.bulk_update(divergentes, ['custo_medio'])
+            if not options['manter_saidas']:
+                MovimentoInsumo.objects.bulk_update(saidas, ['custo_unitario_movimento'], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"SUCESSO: custo médio de {len(divergentes)} de {len(insumos)} insumos corrigido"
+            + ("." if options['manter_saidas'] else f"; {len(saidas)} SAIDAs revaloradas.")
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fabrica.models import Insumo
+
+class Command(BaseCommand):
+    help = 'Reconstrói Insumo.quantidade_estoque a partir do histórico de MovimentoInsumo.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            insumos = list(Insumo.objects.select_for_update().only('id', 'nome', 'quantidade_estoque'))
+            saldos = dict(Insumo.objects.com_estoque_calculado().values_list('id', 'estoque_calculado'))
+            divergentes = []
+            for insumo in insumos:
+                saldo = saldos.get(insumo.id, 0)
+                if insumo.quantidade_estoque != saldo:
+                    self.stdout.write(f" - {insumo.nome}: {insumo.quantidade_estoque} -> {saldo}")
+                    insumo.quantidade_estoque = saldo
+                    divergentes.append(insumo)
+            Insumo.objects.bulk_update(divergentes, ['quantidade_estoque'])
+
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: {len(divergentes)} de {len(insumos)} insumos corrigidos."))
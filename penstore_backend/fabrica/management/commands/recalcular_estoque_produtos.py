@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from loja.models import Produto
+
+class Command(BaseCommand):
+    help = 'Reconstrói Produto.quantidade_estoque a partir do histórico de MovimentoProdutoAcabado.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            produtos = list(Produto.objects.select_for_update().com_estoque().only('id', 'nome', 'quantidade_estoque', 'fragmentos_estoque'))
+            saldos = dict(Produto.objects.com_estoque_calculado().values_list('id', 'estoque_calculado'))
+            divergentes = []
+            corrigidos = 0
+            for produto in produtos:
+                saldo = saldos.get(produto.id, 0)
+                if produto.estoque_atual != saldo:
+                    self.stdout.write(f" - {produto.nome}: {produto.estoque_atual} -> {saldo}")
+                    corrigidos += 1
+                    if produto.fragmentos_estoque:
+                        produto.definir_fragmentos_estoque(produto.fragmentos_estoque, total=saldo)
+                    else:
+                        produto.quantidade_estoque = saldo
+                        divergentes.append(produto)
+            Produto.objects.bulk_update(divergentes, ['quantidade_estoque'])
+
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: {corrigidos} de {len(produtos)} produtos corrigidos."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from fabrica.models import FluxoCaixa, ResumoFluxoCaixa, SaldoCaixaDiario
+
+class Command(BaseCommand):
+    help = 'Reconstrói ResumoFluxoCaixa (totais por dia e categoria) e SaldoCaixaDiario a partir de todos os lançamentos do FluxoCaixa.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totais = FluxoCaixa.objects.values('data_lancamento', 'categoria').annotate(
+                entradas=Sum('valor', filter=Q(tipo='ENTRADA'), default=0),
+                saidas=Sum('valor', filter=Q(tipo='SAIDA'), default=0),
+                lancamentos=Count('id'),
+            ).order_by()
+            resumos = [
+                ResumoFluxoCaixa(
+                    data=total['data_lancamento'], categoria=total['categoria'],
+                    entradas=total['entradas'], saidas=total['saidas'], lancamentos=total['lancamentos'],
+                )
+                for total in totais
+            ]
+            ResumoFluxoCaixa.objects.all().delete()
+            ResumoFluxoCaixa.objects.bulk_create(resumos)
+
+            liquidos = {}
+            for resumo in resumos:
+                liquidos[resumo.data] = liquidos.get(resumo.data, 0) + resumo.entradas - resumo.saidas
+            saldo, saldos = 0, []
+            for data in sorted(liquidos):
+                saldo += liquidos[data]
+                saldos.append(SaldoCaixaDiario(data=data, saldo=saldo))
+            SaldoCaixaDiario.objects.all().delete()
+            SaldoCaixaDiario.objects.bulk_create(saldos)
+
+        self.stdout.write(self.style.SUCCESS(f"SUCESSO: {len(resumos)} linhas de resumo e {len(saldos)} saldos diários gravados."))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0007_composicaoproduto'),
+        ('loja', '0007_produto_quantidade_estoque'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='controlequalidade',
+            index=models.Index(fields=['data_inspecao', 'id'], name='cq_data_inspecao_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fluxocaixa',
+            index=models.Index(fields=['data_lancamento', 'id'], name='fluxo_data_lanc_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logestoquediario',
+            index=models.Index(fields=['data', 'id'], name='logestoque_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentoinsumo',
+            index=models.Index(fields=['data_hora', 'id'], name='movinsumo_data_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentoprodutoacabado',
+            index=models.Index(fields=['data_hora', 'id'], name='movproduto_data_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data_venda', 'id'], name='venda_data_venda_id_idx'),
+        ),
+    ]
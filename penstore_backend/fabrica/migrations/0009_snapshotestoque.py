@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0008_indices_paginacao_cursor'),
+        ('loja', '0007_produto_quantidade_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEstoqueInsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_corte', models.DateTimeField()),
+                ('quantidade', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque do Insumo',
+                'verbose_name_plural': 'Snapshots de Estoque dos Insumos',
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotEstoqueProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_corte', models.DateTimeField()),
+                ('quantidade', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque do Produto',
+                'verbose_name_plural': 'Snapshots de Estoque dos Produtos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimentoinsumo',
+            index=models.Index(fields=['insumo', 'data_hora'], name='movinsumo_insumo_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentoprodutoacabado',
+            index=models.Index(fields=['produto', 'data_hora'], name='movproduto_produto_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoqueinsumo',
+            name='insumo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_estoque', to='fabrica.insumo'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoqueproduto',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_estoque', to='loja.produto'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshotestoqueinsumo',
+            unique_together={('insumo', 'data_corte')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshotestoqueproduto',
+            unique_together={('produto', 'data_corte')},
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def _mesclar(modelo, chave, quantidade, custo=None, snapshot=None, item=None):
+    """
+    Junta as linhas com a mesma referência na mais antiga: quantidades somadas e custo médio ponderado.
+    Os totais do histórico (e portanto os contadores de estoque e o caixa) não mudam.
+    """
+    grupos = modelo.objects.filter(
+        referencia_tabela__isnull=False, referencia_id__isnull=False
+    ).values(*chave).annotate(linhas=Count('id')).filter(linhas__gt=1).order_by()
+    for grupo in grupos:
+        linhas = list(modelo.objects.filter(**{campo: grupo[campo] for campo in chave}).order_by('id'))
+        mantida, extras = linhas[0], linhas[1:]
+        total = sum(getattr(linha, quantidade) for linha in linhas)
+        if custo and total:
+            valor = sum(getattr(linha, quantidade) * getattr(linha, custo) for linha in linhas)
+            setattr(mantida, custo, (valor / total).quantize(Decimal('0.0001')))
+        setattr(mantida, quantidade, total)
+        mantida.save(update_fields=[quantidade] + ([custo] if custo else []))
+
+        if snapshot is not None:
+            # A quantidade das linhas removidas passa a contar no instante da mantida
+            for extra in extras:
+                delta = getattr(extra, quantidade) if extra.tipo == 'ENTRADA' else -getattr(extra, quantidade)
+                filtro = {item: getattr(mantida, item)}
+                snapshot.objects.filter(data_corte__gt=extra.data_hora, **filtro).update(quantidade=F('quantidade') - delta)
+                snapshot.objects.filter(data_corte__gt=mantida.data_hora, **filtro).update(quantidade=F('quantidade') + delta)
+        modelo.objects.filter(pk__in=[extra.pk for extra in extras]).delete()
+
+
+def mesclar_referencias_duplicadas(apps, schema_editor):
+    # O checkout antigo gravava um movimento por linha do pedido ('Pedido Loja'), e as checagens
+    # exists-then-create podiam duplicar lançamentos em corrida; ambos violariam as constraints abaixo
+    _mesclar(
+        apps.get_model('fabrica', 'MovimentoProdutoAcabado'),
+        ('referencia_tabela', 'referencia_id', 'tipo', 'produto_id'), 'quantidade', 'custo_producao_unitario',
+        apps.get_model('fabrica', 'SnapshotEstoqueProduto'), 'produto_id',
+    )
+    _mesclar(
+        apps.get_model('fabrica', 'MovimentoInsumo'),
+        ('referencia_tabela', 'referencia_id', 'tipo', 'insumo_id'), 'quantidade', 'custo_unitario_movimento',
+        apps.get_model('fabrica', 'SnapshotEstoqueInsumo'), 'insumo_id',
+    )
+    _mesclar(apps.get_model('fabrica', 'FluxoCaixa'), ('referencia_tabela', 'referencia_id', 'tipo'), 'valor')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0009_snapshotestoque'),
+        ('loja', '0010_emailpendente'),
+    ]
+
+    operations = [
+        migrations.RunPython(mesclar_referencias_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fluxocaixa',
+            constraint=models.UniqueConstraint(condition=models.Q(('referencia_id__isnull', False), ('referencia_tabela__isnull', False)), fields=('referencia_tabela', 'referencia_id', 'tipo'), name='fluxo_referencia_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='movimentoinsumo',
+            constraint=models.UniqueConstraint(condition=models.Q(('referencia_id__isnull', False), ('referencia_tabela__isnull', False)), fields=('referencia_tabela', 'referencia_id', 'tipo', 'insumo'), name='movinsumo_referencia_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='movimentoprodutoacabado',
+            constraint=models.UniqueConstraint(condition=models.Q(('referencia_id__isnull', False), ('referencia_tabela__isnull', False)), fields=('referencia_tabela', 'referencia_id', 'tipo', 'produto'), name='movproduto_referencia_unica'),
+        ),
+    ]
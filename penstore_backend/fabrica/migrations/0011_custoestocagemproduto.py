@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0010_referencias_unicas'),
+        ('loja', '0010_emailpendente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustoEstocagemProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('quantidade', models.IntegerField()),
+                ('custo_unitario', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custos_estocagem', to='loja.produto')),
+            ],
+            options={
+                'verbose_name': 'Custo de Estocagem do Produto',
+                'verbose_name_plural': 'Custos de Estocagem dos Produtos',
+                'unique_together': {('data', 'produto')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0011_custoestocagemproduto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logestoquediario',
+            name='movimentos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterUniqueTogether(
+            name='logestoquediario',
+            unique_together={('insumo', 'data')},
+        ),
+    ]
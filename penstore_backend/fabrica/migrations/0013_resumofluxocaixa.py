@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def popular_resumo(apps, schema_editor):
+    FluxoCaixa = apps.get_model('fabrica', 'FluxoCaixa')
+    ResumoFluxoCaixa = apps.get_model('fabrica', 'ResumoFluxoCaixa')
+    totais = FluxoCaixa.objects.values('data_lancamento', 'categoria').annotate(
+        entradas=Sum('valor', filter=Q(tipo='ENTRADA'), default=0),
+        saidas=Sum('valor', filter=Q(tipo='SAIDA'), default=0),
+        lancamentos=Count('id'),
+    ).order_by()
+    ResumoFluxoCaixa.objects.bulk_create([
+        ResumoFluxoCaixa(
+            data=total['data_lancamento'], categoria=total['categoria'],
+            entradas=total['entradas'], saidas=total['saidas'], lancamentos=total['lancamentos'],
+        )
+        for total in totais
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0012_logestoquediario_resumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoFluxoCaixa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('categoria', models.CharField(max_length=30)),
+                ('entradas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('saidas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('lancamentos', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumo do Fluxo de Caixa',
+                'verbose_name_plural': 'Resumos do Fluxo de Caixa',
+                'unique_together': {('data', 'categoria')},
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
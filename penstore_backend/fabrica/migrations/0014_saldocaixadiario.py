@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:01
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def popular_saldos(apps, schema_editor):
+    ResumoFluxoCaixa = apps.get_model('fabrica', 'ResumoFluxoCaixa')
+    SaldoCaixaDiario = apps.get_model('fabrica', 'SaldoCaixaDiario')
+    liquidos = ResumoFluxoCaixa.objects.values('data').annotate(
+        liquido=Sum(F('entradas') - F('saidas'))
+    ).order_by('data').values_list('data', 'liquido')
+    saldo, saldos = 0, []
+    for data, liquido in liquidos:
+        saldo += liquido
+        saldos.append(SaldoCaixaDiario(data=data, saldo=saldo))
+    SaldoCaixaDiario.objects.bulk_create(saldos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0013_resumofluxocaixa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoCaixaDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(unique=True)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário de Caixa',
+                'verbose_name_plural': 'Saldos Diários de Caixa',
+            },
+        ),
+        migrations.RunPython(popular_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def custo_medio_inicial(apps, schema_editor):
+    # Ponto de partida: custo de tabela. recalcular_custo_medio_insumos refaz a média a partir do histórico.
+    Insumo = apps.get_model('fabrica', 'Insumo')
+    Insumo.objects.update(custo_medio=F('custo_unitario'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabrica', '0014_saldocaixadiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insumo',
+            name='custo_medio',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.RunPython(custo_medio_inicial, migrations.RunPython.noop),
+    ]
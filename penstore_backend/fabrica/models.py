@@ -1,7 +1,41 @@
-from django.db import models
+from bisect import bisect_right
+from collections import defaultdict
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, Exists, F, IntegerField, OuterRef, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings 
+from loja.cache import invalidar_catalogo
 from loja.models import Produto
 from datetime import date
+from decimal import Decimal
+
+def delta_estoque(tipo, quantidade):
+    return quantidade if tipo == 'ENTRADA' else -quantidade
+
+def acumular_entrada(entradas, insumo_id, tipo, quantidade, custo_unitario, sinal=1):
+    """Soma uma ENTRADA (sinal=1) ou seu estorno (sinal=-1) em {insumo_id: [quantidade, valor]}; SAIDAs são ignoradas."""
+    if tipo == 'ENTRADA':
+        entrada = entradas[insumo_id]
+        entrada[0] += sinal * quantidade
+        entrada[1] += sinal * quantidade * Decimal(str(custo_unitario))
+
+def novas_entradas():
+    return defaultdict(lambda: [0, Decimal('0')])
+
+def custo_medio_apos_entrada(quantidade, custo_medio, entrada_quantidade, entrada_valor):
+    """
+    Média ponderada móvel: (saldo x custo médio + valor da entrada) / (saldo + quantidade da entrada).
+    Com saldo zerado ou negativo vale o custo da própria entrada; estornos que zerariam o saldo ou
+    deixariam a média negativa mantêm o custo atual.
+    """
+    total = quantidade + entrada_quantidade
+    if quantidade > 0 and total > 0:
+        novo = (quantidade * custo_medio + entrada_valor) / total
+    elif quantidade <= 0 and entrada_quantidade > 0:
+        novo = entrada_valor / entrada_quantidade
+    else:
+        return custo_medio
+    return novo.quantize(Decimal('0.0001')) if novo >= 0 else custo_medio
 
 class Maquina(models.Model):
     STATUS_MAQUINA_CHOICES = [('OPERACIONAL', 'Operacional'), ('MANUTENCAO', 'Em Manutenção'), ('INOPERANTE', 'Inoperante')]
@@ -24,16 +58,94 @@ class Fornecedor(models.Model):
     lead_time_medio_dias = models.IntegerField(default=0)
     def __str__(self): return self.nome
 
+class InsumoQuerySet(models.QuerySet):
+    def com_estoque_calculado(self):
+        # Saldo derivado do histórico de MovimentoInsumo, usado na reconciliação do contador
+        return self.annotate(
+            estoque_calculado=Coalesce(Sum(Case(
+                When(movimentos_insumo__tipo='ENTRADA', then=F('movimentos_insumo__quantidade')),
+                When(movimentos_insumo__tipo='SAIDA', then=-F('movimentos_insumo__quantidade')),
+                default=0,
+                output_field=IntegerField(),
+            )), 0)
+        )
+
+    def aplicar_deltas(self, deltas, entradas=None):
+        """
+        Soma {insumo_id: delta} ao saldo em um único UPDATE com CASE. Com `entradas` ({insumo_id: [quantidade,
+        valor]}, ver acumular_entrada) o mesmo UPDATE grava o novo custo médio, calculado sobre as linhas
+        travadas: uma leitura a mais por lote, independente do tamanho do histórico.
+        """
+        deltas = {insumo_id: delta for insumo_id, delta in deltas.items() if delta}
+        entradas = {insumo_id: entrada for insumo_id, entrada in (entradas or {}).items() if any(entrada)}
+        if not deltas and not entradas:
+            return
+        campos = {
+            'quantidade_estoque': F('quantidade_estoque') + Case(
+                *[When(pk=insumo_id, then=Value(delta)) for insumo_id, delta in deltas.items()],
+                default=Value(0),
+            )
+        }
+        if entradas:
+            atuais = self.select_for_update().filter(pk__in=entradas).values_list('id', 'quantidade_estoque', 'custo_medio')
+            custos = {
+                insumo_id: custo_medio_apos_entrada(quantidade, custo_medio, *entradas[insumo_id])
+                for insumo_id, quantidade, custo_medio in atuais
+            }
+            campos['custo_medio'] = Case(
+                *[When(pk=insumo_id, then=Value(custo)) for insumo_id, custo in custos.items()],
+                default=F('custo_medio'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=4),
+            )
+        self.filter(pk__in=set(deltas) | set(entradas)).update(**campos)
+
 class Insumo(models.Model):
+    # Mantidos pelos movimentos (saldo via F(), custo médio a cada ENTRADA)
+    CAMPOS_ESTOQUE = ('quantidade_estoque', 'custo_medio')
+
     nome = models.CharField(max_length=100, unique=True)
     codigo = models.CharField(max_length=50, unique=True, blank=True, null=True) 
     fornecedor = models.ForeignKey(Fornecedor, on_delete=models.SET_NULL, null=True, blank=True, related_name='insumos_fornecidos')
     custo_unitario = models.DecimalField(max_digits=10, decimal_places=4)
+    # Média ponderada móvel das ENTRADAs; as SAIDAs são valoradas por ela (ver custo_medio_apos_entrada)
+    custo_medio = models.DecimalField(max_digits=12, decimal_places=4, default=0)
     estoque_minimo = models.IntegerField(default=5000)
     unidade_medida = models.CharField(max_length=10, default='un')
     quantidade_estoque = models.IntegerField(default=0) 
+
+    objects = InsumoQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.custo_medio:
+            self.custo_medio = self.custo_unitario
+        # Não sobrescrever com o valor em memória
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_ESTOQUE
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self): return f"{self.nome} ({self.quantidade_estoque} {self.unidade_medida})"
 
+class MovimentoInsumoQuerySet(models.QuerySet):
+    def registrar_em_lote(self, movimentos):
+        # bulk_create não dispara post_save: os deltas são somados por insumo e aplicados em um único UPDATE.
+        with transaction.atomic():
+            saidas = {movimento.insumo_id for movimento in movimentos if movimento.tipo == 'SAIDA'}
+            if saidas:
+                custos = dict(Insumo.objects.filter(pk__in=saidas).values_list('id', 'custo_medio'))
+                for movimento in movimentos:
+                    if movimento.tipo == 'SAIDA':
+                        movimento.custo_unitario_movimento = custos[movimento.insumo_id]
+            criados = self.bulk_create(movimentos)
+            deltas, entradas = defaultdict(int), novas_entradas()
+            for movimento in criados:
+                deltas[movimento.insumo_id] += delta_estoque(movimento.tipo, movimento.quantidade)
+                acumular_entrada(entradas, movimento.insumo_id, movimento.tipo, movimento.quantidade, movimento.custo_unitario_movimento)
+            Insumo.objects.aplicar_deltas(deltas, entradas)
+        return criados
+
 class MovimentoInsumo(models.Model):
     TIPO_CHOICES = [('ENTRADA', 'Entrada'), ('SAIDA', 'Saída')]
     insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name='movimentos_insumo') 
@@ -43,8 +155,63 @@ class MovimentoInsumo(models.Model):
     custo_unitario_movimento = models.DecimalField(max_digits=10, decimal_places=4, default=0.0)
     referencia_tabela = models.CharField(max_length=50, blank=True, null=True)
     referencia_id = models.IntegerField(blank=True, null=True)
+
+    objects = MovimentoInsumoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_hora', 'id'], name='movinsumo_data_hora_id_idx'),
+            models.Index(fields=['insumo', 'data_hora'], name='movinsumo_insumo_data_idx'),
+        ]
+        # Também é o índice das consultas de idempotência por (referencia_tabela, referencia_id, tipo)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['referencia_tabela', 'referencia_id', 'tipo', 'insumo'],
+                condition=models.Q(referencia_tabela__isnull=False, referencia_id__isnull=False),
+                name='movinsumo_referencia_unica',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self._state.adding and self.tipo == 'SAIDA':
+                # SAIDAs valem o custo médio vigente, venham da API, do admin ou das tarefas
+                self.custo_unitario_movimento = Insumo.objects.filter(
+                    pk=self.insumo_id
+                ).values_list('custo_medio', flat=True).get()
+            anterior = None
+            if self.pk:
+                anterior = MovimentoInsumo.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('insumo_id', 'data_hora', 'tipo', 'quantidade', 'custo_unitario_movimento').first()
+            super().save(*args, **kwargs)
+            if anterior:
+                deltas, entradas = defaultdict(int), novas_entradas()
+                deltas[anterior['insumo_id']] -= delta_estoque(anterior['tipo'], anterior['quantidade'])
+                deltas[self.insumo_id] += delta_estoque(self.tipo, self.quantidade)
+                acumular_entrada(entradas, anterior['insumo_id'], anterior['tipo'], anterior['quantidade'], anterior['custo_unitario_movimento'], sinal=-1)
+                acumular_entrada(entradas, self.insumo_id, self.tipo, self.quantidade, self.custo_unitario_movimento)
+                Insumo.objects.aplicar_deltas(deltas, entradas)
+                SnapshotEstoqueInsumo.ajustar(anterior['insumo_id'], anterior['data_hora'], -delta_estoque(anterior['tipo'], anterior['quantidade']))
+                SnapshotEstoqueInsumo.ajustar(self.insumo_id, self.data_hora, delta_estoque(self.tipo, self.quantidade))
+
     def __str__(self): return f"{self.tipo} - {self.insumo.nome}"
 
+class MovimentoProdutoAcabadoQuerySet(models.QuerySet):
+    def registrar_em_lote(self, movimentos, atualizar_estoque=True):
+        # bulk_create não chama save() nem dispara post_save: o saldo e o cache do catálogo são atualizados aqui.
+        # atualizar_estoque=False quando o saldo já foi debitado antes (ex: Produto.objects.reservar_estoque).
+        with transaction.atomic():
+            criados = self.bulk_create(movimentos)
+            deltas = defaultdict(int)
+            for movimento in criados:
+                deltas[movimento.produto_id] += delta_estoque(movimento.tipo, movimento.quantidade)
+            if atualizar_estoque:
+                Produto.objects.aplicar_deltas(deltas)
+            if deltas:
+                transaction.on_commit(invalidar_catalogo)
+        return criados
+
 class MovimentoProdutoAcabado(models.Model):
     TIPO_CHOICES = [('ENTRADA', 'Entrada'), ('SAIDA', 'Saída')]
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='movimentos_produto_acabado')
@@ -54,6 +221,39 @@ class MovimentoProdutoAcabado(models.Model):
     custo_producao_unitario = models.DecimalField(max_digits=10, decimal_places=4)
     referencia_tabela = models.CharField(max_length=50, blank=True, null=True)
     referencia_id = models.IntegerField(blank=True, null=True)
+
+    objects = MovimentoProdutoAcabadoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_hora', 'id'], name='movproduto_data_hora_id_idx'),
+            models.Index(fields=['produto', 'data_hora'], name='movproduto_produto_data_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['referencia_tabela', 'referencia_id', 'tipo', 'produto'],
+                condition=models.Q(referencia_tabela__isnull=False, referencia_id__isnull=False),
+                name='movproduto_referencia_unica',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = MovimentoProdutoAcabado.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('produto_id', 'data_hora', 'tipo', 'quantidade').first()
+            super().save(*args, **kwargs)
+            delta = delta_estoque(self.tipo, self.quantidade)
+            deltas = defaultdict(int, {self.produto_id: delta})
+            if anterior:
+                delta_anterior = delta_estoque(anterior['tipo'], anterior['quantidade'])
+                deltas[anterior['produto_id']] -= delta_anterior
+                SnapshotEstoqueProduto.ajustar(anterior['produto_id'], anterior['data_hora'], -delta_anterior)
+                SnapshotEstoqueProduto.ajustar(self.produto_id, self.data_hora, delta)
+            Produto.objects.aplicar_deltas(deltas)
+
     def __str__(self): return f"{self.tipo} - {self.produto.nome}"
 
 class PedidoCompra(models.Model):
@@ -62,6 +262,36 @@ class PedidoCompra(models.Model):
     data_pedido = models.DateField(auto_now_add=True)
     valor_total_pedido = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+
+    def save(self, *args, **kwargs):
+        # O post_save enfileira o recebimento; pedido e tarefa são gravados juntos ou nenhum dos dois
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def registrar_entrada_insumos(self):
+        """
+        Lança a ENTRADA dos itens que ainda não têm movimento (uma consulta) em um único bulk_create,
+        com o estoque somado por insumo. Chamadas repetidas não duplicam estoque.
+        """
+        lancado = MovimentoInsumo.objects.filter(
+            referencia_tabela='ItemPedidoCompra', referencia_id=OuterRef('pk'), tipo='ENTRADA'
+        )
+        with transaction.atomic():
+            # Recebimentos concorrentes do mesmo pedido esperam aqui em vez de colidir na constraint única
+            list(PedidoCompra.objects.select_for_update().filter(pk=self.pk).values_list('pk', flat=True))
+            pendentes = self.itens_pedido_compra.annotate(lancado=Exists(lancado)).filter(lancado=False)
+            return MovimentoInsumo.objects.registrar_em_lote([
+                MovimentoInsumo(
+                    insumo_id=item.insumo_id,
+                    tipo='ENTRADA',
+                    quantidade=item.quantidade,
+                    custo_unitario_movimento=item.custo_unitario_compra,
+                    referencia_tabela='ItemPedidoCompra',
+                    referencia_id=item.id
+                )
+                for item in pendentes
+            ])
+
     def __str__(self): return f"Pedido {self.id} - {self.fornecedor.nome}"
 
 class ItemPedidoCompra(models.Model):
@@ -101,6 +331,13 @@ class ControleQualidade(models.Model):
     inspetor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='inspecoes_realizadas')
     observacoes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['data_inspecao', 'id'], name='cq_data_inspecao_id_idx')]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Controle #{self.id} - Ordem {self.ordem_producao.id} ({self.status})"
 
@@ -110,8 +347,32 @@ class Venda(models.Model):
     quantidade = models.IntegerField()
     valor_unitario_praticado = models.DecimalField(max_digits=10, decimal_places=4)
     valor_total_venda = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [models.Index(fields=['data_venda', 'id'], name='venda_data_venda_id_idx')]
+
     def __str__(self): return f"Venda {self.id} - {self.produto.nome}"
 
+def acumular_resumo(deltas, data, categoria, tipo, valor, sinal=1):
+    """Soma um lançamento (sinal=1) ou seu estorno (sinal=-1) em {(data, categoria): [entradas, saidas, lancamentos]}."""
+    delta = deltas[(data, categoria)]
+    delta[0 if tipo == 'ENTRADA' else 1] += sinal * valor
+    delta[2] += sinal
+
+def novos_deltas_resumo():
+    return defaultdict(lambda: [Decimal('0'), Decimal('0'), 0])
+
+class FluxoCaixaQuerySet(models.QuerySet):
+    def registrar_em_lote(self, lancamentos):
+        # bulk_create não chama save(): o resumo diário é atualizado aqui
+        with transaction.atomic():
+            criados = self.bulk_create(lancamentos)
+            deltas = novos_deltas_resumo()
+            for lancamento in criados:
+                acumular_resumo(deltas, lancamento.data_lancamento, lancamento.categoria, lancamento.tipo, lancamento.valor)
+            ResumoFluxoCaixa.aplicar(deltas)
+        return criados
+
 class FluxoCaixa(models.Model):
     TIPO_CHOICES = [('ENTRADA', 'Entrada'), ('SAIDA', 'Saída')]
     CATEGORIA_CHOICES = [('VENDA', 'Venda'), ('INSUMO', 'Insumo'), ('SALARIO', 'Salário'), ('CAPITAL_INICIAL', 'Capital Inicial'), ('OUTROS', 'Outros')]
@@ -122,8 +383,137 @@ class FluxoCaixa(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=2)
     referencia_id = models.IntegerField(blank=True, null=True)
     referencia_tabela = models.CharField(max_length=50, blank=True, null=True)
+
+    objects = FluxoCaixaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['data_lancamento', 'id'], name='fluxo_data_lanc_id_idx')]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['referencia_tabela', 'referencia_id', 'tipo'],
+                condition=models.Q(referencia_tabela__isnull=False, referencia_id__isnull=False),
+                name='fluxo_referencia_unica',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = FluxoCaixa.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('data_lancamento', 'categoria', 'tipo', 'valor').first()
+            super().save(*args, **kwargs)
+            deltas = novos_deltas_resumo()
+            if anterior:
+                acumular_resumo(deltas, *anterior.values(), sinal=-1)
+            # to_python: data e valor podem ter sido atribuídos como texto/float
+            acumular_resumo(
+                deltas,
+                self._meta.get_field('data_lancamento').to_python(self.data_lancamento),
+                self.categoria,
+                self.tipo,
+                self._meta.get_field('valor').to_python(self.valor),
+            )
+            ResumoFluxoCaixa.aplicar(deltas)
+
     def __str__(self): return f"{self.tipo} - {self.categoria} ({self.valor})"
 
+class SaldoCaixaDiario(models.Model):
+    """Saldo de caixa acumulado no fechamento de cada dia com lançamentos. O saldo em uma data é a última linha até ela."""
+    # Linha fixa (saldo 0, anterior a qualquer lançamento) travada por todo aplicar()
+    DATA_TRAVA = date.min
+
+    data = models.DateField(unique=True)
+    saldo = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Saldo Diário de Caixa"
+        verbose_name_plural = "Saldos Diários de Caixa"
+
+    @classmethod
+    def saldo_em(cls, dia):
+        # Busca pelo índice único de data: O(log n), independente do tamanho do histórico
+        saldo = cls.objects.filter(data__lte=dia).order_by('-data').values_list('saldo', flat=True).first()
+        return saldo if saldo is not None else Decimal('0')
+
+    @classmethod
+    def _travar(cls):
+        # Sem ela, com a tabela vazia ou um novo primeiro dia, não haveria linha a travar e
+        # lançamentos simultâneos semeariam os dias novos com saldos divergentes
+        trava = cls.objects.select_for_update().filter(data=cls.DATA_TRAVA)
+        if not list(trava.values_list('pk', flat=True)):
+            cls.objects.get_or_create(data=cls.DATA_TRAVA)
+            list(trava.values_list('pk', flat=True))
+
+    @classmethod
+    def aplicar(cls, deltas):
+        """
+        Soma {data: valor líquido} ao fechamento do dia e de todos os dias seguintes. Lançamentos retroativos
+        recalculam só o sufixo a partir da data, em um único UPDATE com CASE.
+        """
+        deltas = {dia: valor for dia, valor in deltas.items() if valor}
+        if not deltas:
+            return
+        dias = sorted(deltas)
+        cls._travar()
+        # Lidos depois da trava: já enxergam os dias criados pela transação que a segurava
+        anterior = cls.objects.filter(data__lt=dias[0]).order_by('-data').values_list('data', flat=True).first()
+        existentes = list(cls.objects.filter(
+            data__gte=anterior or dias[0]
+        ).order_by('data').values_list('data', 'saldo'))
+        datas = [data for data, _ in existentes]
+
+        novos = []
+        for dia in dias:
+            posicao = bisect_right(datas, dia)
+            if not posicao or datas[posicao - 1] != dia:
+                novos.append(cls(data=dia, saldo=existentes[posicao - 1][1] if posicao else Decimal('0')))
+        cls.objects.bulk_create(novos, ignore_conflicts=True)
+
+        acumulado, casos = Decimal('0'), []
+        for dia in dias:
+            acumulado += deltas[dia]
+            casos.append(When(data__gte=dia, then=Value(acumulado)))
+        cls.objects.filter(data__gte=dias[0]).update(
+            saldo=F('saldo') + Case(*reversed(casos), default=Value(0), output_field=DecimalField())
+        )
+
+    def __str__(self): return f"{self.data}: {self.saldo}"
+
+class ResumoFluxoCaixa(models.Model):
+    """Totais de FluxoCaixa por dia e categoria, mantidos a cada lançamento criado, editado ou removido."""
+    data = models.DateField()
+    categoria = models.CharField(max_length=30)
+    entradas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    saidas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lancamentos = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('data', 'categoria')
+        verbose_name = "Resumo do Fluxo de Caixa"
+        verbose_name_plural = "Resumos do Fluxo de Caixa"
+
+    @classmethod
+    def aplicar(cls, deltas):
+        deltas = {chave: delta for chave, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        cls.objects.bulk_create([cls(data=data, categoria=categoria) for data, categoria in deltas], ignore_conflicts=True)
+        # Ordem fixa de chaves para que transações concorrentes travem as linhas na mesma sequência
+        for (data, categoria), (entradas, saidas, lancamentos) in sorted(deltas.items()):
+            cls.objects.filter(data=data, categoria=categoria).update(
+                entradas=F('entradas') + entradas,
+                saidas=F('saidas') + saidas,
+                lancamentos=F('lancamentos') + lancamentos,
+            )
+        saldos = defaultdict(Decimal)
+        for (data, _), (entradas, saidas, _) in deltas.items():
+            saldos[data] += entradas - saidas
+        SaldoCaixaDiario.aplicar(saldos)
+
+    def __str__(self): return f"{self.data} - {self.categoria}: +{self.entradas} / -{self.saidas}"
+
 class LogEstoqueDiario(models.Model):
     insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name='logs_estoque')
     data = models.DateField(default=date.today)
@@ -131,7 +521,13 @@ class LogEstoqueDiario(models.Model):
     quantidade_final = models.IntegerField(default=0)
     custo_estocagem_dia = models.DecimalField(max_digits=10, decimal_places=2)
     lancado_financeiro = models.BooleanField(default=False)
-    movimentos = models.TextField(blank=True, null=True)
+    # Resumo do dia: {"entradas": n, "saidas": n, "quantidade_entrada": q, "quantidade_saida": q}
+    movimentos = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        unique_together = ('insumo', 'data')
+        indexes = [models.Index(fields=['data', 'id'], name='logestoque_data_id_idx')]
+
     def __str__(self): return f"{self.data} - {self.insumo.nome}"
 
 class ComposicaoProduto(models.Model):
@@ -145,4 +541,51 @@ class ComposicaoProduto(models.Model):
         verbose_name_plural = "Composições dos Produtos"
 
     def __str__(self):
-        return f"{self.produto.nome} -> {self.insumo.nome} (Qtd: {self.quantidade_necessaria})"
\ No newline at end of file
+        return f"{self.produto.nome} -> {self.insumo.nome} (Qtd: {self.quantidade_necessaria})"
+
+class SnapshotEstoqueProduto(models.Model):
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='snapshots_estoque')
+    data_corte = models.DateTimeField()
+    quantidade = models.IntegerField()
+
+    class Meta:
+        unique_together = ('produto', 'data_corte')
+        verbose_name = "Snapshot de Estoque do Produto"
+        verbose_name_plural = "Snapshots de Estoque dos Produtos"
+
+    @classmethod
+    def ajustar(cls, produto_id, data_hora, delta):
+        # Movimento editado/removido antes do corte: os snapshots posteriores deixam de bater com o histórico
+        cls.objects.filter(produto_id=produto_id, data_corte__gt=data_hora).update(quantidade=F('quantidade') + delta)
+
+    def __str__(self): return f"{self.produto.nome} em {self.data_corte}: {self.quantidade}"
+
+class SnapshotEstoqueInsumo(models.Model):
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name='snapshots_estoque')
+    data_corte = models.DateTimeField()
+    quantidade = models.IntegerField()
+
+    class Meta:
+        unique_together = ('insumo', 'data_corte')
+        verbose_name = "Snapshot de Estoque do Insumo"
+        verbose_name_plural = "Snapshots de Estoque dos Insumos"
+
+    @classmethod
+    def ajustar(cls, insumo_id, data_hora, delta):
+        cls.objects.filter(insumo_id=insumo_id, data_corte__gt=data_hora).update(quantidade=F('quantidade') + delta)
+
+    def __str__(self): return f"{self.insumo.nome} em {self.data_corte}: {self.quantidade}"
+
+class CustoEstocagemProduto(models.Model):
+    data = models.DateField()
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='custos_estocagem')
+    quantidade = models.IntegerField()
+    custo_unitario = models.DecimalField(max_digits=10, decimal_places=4)
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = ('data', 'produto')
+        verbose_name = "Custo de Estocagem do Produto"
+        verbose_name_plural = "Custos de Estocagem dos Produtos"
+
+    def __str__(self): return f"{self.data} - {self.produto.nome}: R$ {self.valor}"
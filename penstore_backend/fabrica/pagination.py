@@ -0,0 +1,85 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+class PaginacaoCursor(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-id',)
+
+class PaginacaoChaveComposta(PaginacaoCursor):
+    """
+    Cursor sobre (campo, id). O CursorPagination do DRF só filtra pelo primeiro campo da ordenação e resolve
+    empates com OFFSET (limitado a 1000): com muitas linhas na mesma data as páginas se repetem. Aqui a
+    posição carrega também o id, e cada página é uma busca pelo índice (campo, id), sem OFFSET.
+    """
+
+    def _get_position_from_instance(self, instance, ordering):
+        campo, desempate = (ordem.lstrip('-') for ordem in ordering[:2])
+        if isinstance(instance, dict):
+            return f"{instance[campo]}|{instance[desempate]}"
+        return f"{getattr(instance, campo)}|{getattr(instance, desempate)}"
+
+    def _filtro_posicao(self, queryset, posicao, reverse):
+        campo, desempate = (ordem.lstrip('-') for ordem in self.ordering[:2])
+        try:
+            valor, chave = posicao.rsplit('|', 1)
+            valor = queryset.model._meta.get_field(campo).to_python(valor)
+            chave = int(chave)
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        # Mesma regra do DRF: (cursor invertido) XOR (ordenação decrescente) decide o sentido
+        operador = 'lt' if reverse != self.ordering[0].startswith('-') else 'gt'
+        return Q(**{f'{campo}__{operador}': valor}) | Q(**{campo: valor, f'{desempate}__{operador}': chave})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, posicao = (self.cursor.reverse, self.cursor.position) if self.cursor else (False, None)
+
+        if reverse:
+            queryset = queryset.order_by(*(ordem[1:] if ordem.startswith('-') else f'-{ordem}' for ordem in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if posicao is not None:
+            queryset = queryset.filter(self._filtro_posicao(queryset, posicao, reverse))
+
+        # Posições são únicas: o item extra só indica se há próxima página, nunca é preciso OFFSET
+        resultados = list(queryset[:self.page_size + 1])
+        self.page = resultados[:self.page_size]
+        seguinte = self._get_position_from_instance(resultados[-1], self.ordering) if len(resultados) > self.page_size else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = posicao is not None, posicao
+            self.has_previous, self.previous_position = seguinte is not None, seguinte
+        else:
+            self.has_next, self.next_position = seguinte is not None, seguinte
+            self.has_previous, self.previous_position = posicao is not None, posicao
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+class PaginacaoPorDataHora(PaginacaoChaveComposta):
+    ordering = ('-data_hora', '-id')
+
+class PaginacaoPorDataLancamento(PaginacaoChaveComposta):
+    ordering = ('-data_lancamento', '-id')
+
+class PaginacaoPorData(PaginacaoChaveComposta):
+    ordering = ('-data', '-id')
+
+class PaginacaoPorDataVenda(PaginacaoChaveComposta):
+    ordering = ('-data_venda', '-id')
+
+class PaginacaoPorDataInspecao(PaginacaoChaveComposta):
+    ordering = ('-data_inspecao', '-id')
@@ -40,8 +40,9 @@ class InsumoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nome', 'codigo', 'fornecedor', 'fornecedor_nome', 
             'unidade_medida', 'quantidade_estoque', 'estoque_minimo', 
-            'custo_unitario'
+            'custo_unitario', 'custo_medio'
         ]
+        read_only_fields = ['quantidade_estoque', 'custo_medio']
 
     def get_fornecedor_nome(self, obj):
         if obj.fornecedor:
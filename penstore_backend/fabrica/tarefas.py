@@ -0,0 +1,126 @@
+import logging
+
+from django.db import IntegrityError, transaction
+
+from loja.models import Pedido
+from loja.tarefas import tarefa
+
+from .instrumentacao import instrumentado
+from .models import (
+    ComposicaoProduto, ControleQualidade, FluxoCaixa,
+    MovimentoInsumo, MovimentoProdutoAcabado, PedidoCompra
+)
+
+logger = logging.getLogger(__name__)
+
+# Efeitos colaterais dos saves de ControleQualidade, PedidoCompra e Pedido. Os signals apenas enfileiram
+# a tarefa; cada uma roda em uma transação própria no worker (processar_tarefas) e pode ser reexecutada
+# sem duplicar lançamentos graças às constraints únicas de referência.
+
+
+@tarefa('fabrica.lancar_controle_qualidade')
+@instrumentado
+def lancar_controle_qualidade(controle_id):
+    controle = ControleQualidade.objects.select_for_update().select_related(
+        'ordem_producao__produto_acabado'
+    ).filter(pk=controle_id).first()
+    if controle is None:
+        return
+    ordem_producao = controle.ordem_producao
+    produto_final = ordem_producao.produto_acabado
+
+    # 1. ENTRADA de Produto Acabado (Apenas APROVADO)
+    if controle.status == 'APROVADO':
+        try:
+            if controle.quantidade_aprovada > 0:
+                MovimentoProdutoAcabado.objects.create(
+                    produto=produto_final,
+                    tipo='ENTRADA',
+                    quantidade=controle.quantidade_aprovada,
+                    custo_producao_unitario=produto_final.custo_base_producao_unitario,
+                    referencia_tabela='ControleQualidade',
+                    referencia_id=controle.id
+                )
+                logger.info("CQ %s: ENTRADA de %s %s.", controle.id, controle.quantidade_aprovada, produto_final.nome)
+
+            if ordem_producao.status != 'CONCLUIDA':
+                ordem_producao.status = 'CONCLUIDA'
+                ordem_producao.save(update_fields=['status'])
+        except IntegrityError:
+            pass
+
+    # 2. SAIDA de Insumos (APROVADO ou REPROVADO, apenas uma vez). Consumo total = aprovado + rejeitado
+    quantidade_total_produzida = controle.quantidade_aprovada + controle.quantidade_rejeitada
+    if controle.status in ['APROVADO', 'REPROVADO'] and quantidade_total_produzida > 0:
+        composicao_itens = list(
+            ComposicaoProduto.objects.filter(produto_id=produto_final.id).select_related('insumo')
+        )
+        if not composicao_itens:
+            logger.warning("CQ %s: produto '%s' não tem Ficha Técnica.", controle.id, produto_final.nome)
+
+        # Uma ficha técnica inteira vira um único INSERT em lote e um UPDATE agregado por insumo.
+        # registrar_em_lote valora o consumo pelo custo médio vigente.
+        movimentos = [
+            MovimentoInsumo(
+                insumo=item.insumo,
+                tipo='SAIDA',
+                quantidade=int(item.quantidade_necessaria * quantidade_total_produzida),
+                referencia_tabela='ControleQualidade',
+                referencia_id=controle.id
+            )
+            for item in composicao_itens
+        ]
+        try:
+            MovimentoInsumo.objects.registrar_em_lote(movimentos)
+        except IntegrityError:
+            return
+        for movimento in movimentos:
+            logger.info("CQ %s: SAIDA de %s %s (Matéria-Prima).", controle.id, movimento.quantidade, movimento.insumo.nome)
+
+
+@tarefa('fabrica.receber_pedido_compra')
+@instrumentado
+def receber_pedido_compra(pedido_compra_id):
+    pedido_compra = PedidoCompra.objects.select_related('fornecedor').filter(pk=pedido_compra_id).first()
+    if pedido_compra is None or pedido_compra.status != 'RECEBIDO_TOTAL':
+        return
+
+    try:
+        with transaction.atomic():
+            FluxoCaixa.objects.create(
+                tipo='SAIDA',
+                categoria='INSUMO',
+                descricao=f'Pagamento Pedido de Compra #{pedido_compra.id} - {pedido_compra.fornecedor.nome}',
+                valor=pedido_compra.valor_total_pedido,
+                data_lancamento=pedido_compra.data_pedido,
+                referencia_tabela='PedidoCompra',
+                referencia_id=pedido_compra.id
+            )
+        logger.info("PedidoCompra %s: SAIDA de R$%s no Fluxo de Caixa.", pedido_compra.id, pedido_compra.valor_total_pedido)
+    except IntegrityError:
+        pass
+
+    movimentos = pedido_compra.registrar_entrada_insumos()
+    if movimentos:
+        logger.info("PedidoCompra %s: ENTRADA de %s itens no estoque de insumos.", pedido_compra.id, len(movimentos))
+
+
+@tarefa('fabrica.registrar_venda')
+@instrumentado
+def registrar_venda(pedido_id):
+    pedido = Pedido.objects.filter(pk=pedido_id, status='entregue').first()
+    if pedido is None:
+        return
+    lancamento, created = FluxoCaixa.objects.get_or_create(
+        referencia_tabela='Pedido',
+        referencia_id=pedido.id,
+        tipo='ENTRADA',
+        defaults={
+            'categoria': 'VENDA',
+            'descricao': f'Recebimento referente ao Pedido #{pedido.id}',
+            'valor': pedido.total_pedido,
+            'data_lancamento': pedido.created_at.date(),
+        }
+    )
+    if created:
+        logger.info("Pedido %s: venda registrada no caixa.", pedido.id)
@@ -1,3 +1,192 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from loja.models import Produto
+from loja.tarefas import processar_tarefas
+
+from .custos import processar_custos_periodo
+from .models import (
+    CustoEstocagemProduto, FluxoCaixa, Fornecedor, Insumo, ItemPedidoCompra, MovimentoInsumo,
+    MovimentoProdutoAcabado, PedidoCompra, SaldoCaixaDiario
+)
+from .tarefas import receber_pedido_compra
+
+
+class EscritoresConcorrentesTestCase(TransactionTestCase):
+    threads = 12
+    escritas_por_thread = 15
+
+    def _gravar(self, escrita):
+        for tentativa in range(200):
+            try:
+                with transaction.atomic():
+                    escrita()
+                return
+            except OperationalError:
+                # SQLite recusa escritores simultâneos ("database table is locked"): espera e tenta de novo
+                time.sleep(random.uniform(0, 0.002 * (tentativa + 1)))
+        raise AssertionError("Escrita não concluída após 200 tentativas.")
+
+
+class ReconciliacaoEstoqueInsumoTests(EscritoresConcorrentesTestCase):
+    """O contador Insumo.quantidade_estoque não pode divergir do histórico com escritores concorrentes."""
+
+    def _movimento(self, sorteio, insumos):
+        # Dados, não instâncias: cada tentativa cria objetos novos, sem pk herdado de uma tentativa desfeita
+        return {
+            'insumo': sorteio.choice(insumos),
+            'tipo': sorteio.choice(['ENTRADA', 'SAIDA']),
+            'quantidade': sorteio.randint(1, 50),
+            'custo_unitario_movimento': sorteio.randint(1, 9),
+        }
+
+    def test_escritores_concorrentes_nao_geram_divergencia(self):
+        insumos = [Insumo.objects.create(nome=f'Insumo {i}', custo_unitario=1) for i in range(3)]
+        largada = threading.Barrier(self.threads)
+        erros = []
+
+        def escrever(semente):
+            sorteio = random.Random(semente)
+            try:
+                largada.wait()
+                for _ in range(self.escritas_por_thread):
+                    if semente % 2:
+                        # Movimento avulso: saldo atualizado pelo post_save
+                        dados = self._movimento(sorteio, insumos)
+                        self._gravar(lambda: MovimentoInsumo.objects.create(**dados))
+                    else:
+                        lote = [self._movimento(sorteio, insumos) for _ in range(sorteio.randint(2, 6))]
+                        self._gravar(lambda: MovimentoInsumo.objects.registrar_em_lote([MovimentoInsumo(**dados) for dados in lote]))
+            except Exception as e:
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escrever, args=(semente,)) for semente in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertGreater(MovimentoInsumo.objects.count(), self.threads * self.escritas_por_thread)
+        for insumo in Insumo.objects.com_estoque_calculado():
+            self.assertEqual(insumo.quantidade_estoque, insumo.estoque_calculado, insumo.nome)
+
+
+
+class SaldoCaixaConcorrenteTests(EscritoresConcorrentesTestCase):
+    """Primeiros lançamentos simultâneos, com a tabela de saldos vazia, não podem divergir do histórico."""
+
+    escritas_por_thread = 8
+
+    def test_escritores_concorrentes_nao_geram_divergencia(self):
+        inicio = date(2025, 1, 1)
+        largada = threading.Barrier(self.threads)
+        erros = []
+
+        def escrever(semente):
+            sorteio = random.Random(semente)
+            try:
+                largada.wait()
+                for _ in range(self.escritas_por_thread):
+                    # Tabela de saldos vazia e datas sorteadas: vários lançamentos criam um novo primeiro dia
+                    dados = {
+                        'tipo': sorteio.choice(['ENTRADA', 'SAIDA']),
+                        'categoria': 'VENDA',
+                        'descricao': 'Lançamento concorrente',
+                        'valor': Decimal(sorteio.randint(1, 10000)) / 100,
+                        'data_lancamento': inicio + timedelta(days=sorteio.randint(0, 30)),
+                    }
+                    self._gravar(lambda: FluxoCaixa.objects.create(**dados))
+            except Exception as e:
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escrever, args=(semente,)) for semente in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        saldo = Decimal('0')
+        for dia in (inicio + timedelta(days=d) for d in range(31)):
+            for tipo, valor in FluxoCaixa.objects.filter(data_lancamento=dia).values_list('tipo', 'valor'):
+                saldo += valor if tipo == 'ENTRADA' else -valor
+            self.assertEqual(SaldoCaixaDiario.saldo_em(dia), saldo, dia)
+
+
+class SaveInsumoTests(TestCase):
+    def test_save_de_instancia_desatualizada_nao_sobrescreve_saldo(self):
+        insumo = Insumo.objects.create(nome='Tinta', custo_unitario=1)
+        desatualizado = Insumo.objects.get(pk=insumo.pk)
+        MovimentoInsumo.objects.create(insumo=insumo, tipo='ENTRADA', quantidade=40, custo_unitario_movimento=1)
+
+        desatualizado.estoque_minimo = 10
+        desatualizado.save()
+
+        insumo.refresh_from_db()
+        self.assertEqual((insumo.quantidade_estoque, insumo.estoque_minimo), (40, 10))
+
+    def test_save_de_instancia_desatualizada_nao_sobrescreve_custo_medio(self):
+        insumo = Insumo.objects.create(nome='Tinta', custo_unitario=2)
+        desatualizado = Insumo.objects.get(pk=insumo.pk)
+        MovimentoInsumo.objects.create(insumo=insumo, tipo='ENTRADA', quantidade=10, custo_unitario_movimento=4)
+
+        desatualizado.custo_unitario = 5
+        desatualizado.save()
+
+        insumo.refresh_from_db()
+        self.assertEqual((insumo.custo_medio, insumo.custo_unitario), (4, 5))
+
+
+@override_settings(TAREFAS_SINCRONAS=False)
+class ReceberPedidoCompraTests(TestCase):
+    def test_reexecucao_nao_duplica_lancamentos(self):
+        fornecedor = Fornecedor.objects.create(nome='Fornecedor')
+        insumos = [Insumo.objects.create(nome=nome, custo_unitario=1) for nome in ('Tubo', 'Mola')]
+        pedido = PedidoCompra.objects.create(fornecedor=fornecedor, valor_total_pedido=30)
+        for insumo in insumos:
+            ItemPedidoCompra.objects.create(pedido_compra=pedido, insumo=insumo, quantidade=10, custo_unitario_compra=1.5)
+
+        pedido.status = 'RECEBIDO_TOTAL'
+        pedido.save()
+        # A tarefa enfileirada pelo signal e duas reexecuções (ex: worker que morreu após o commit)
+        self.assertEqual(processar_tarefas(), 1)
+        receber_pedido_compra(pedido.id)
+        receber_pedido_compra(pedido.id)
+
+        self.assertEqual(FluxoCaixa.objects.filter(referencia_tabela='PedidoCompra', referencia_id=pedido.id).count(), 1)
+        self.assertEqual(MovimentoInsumo.objects.filter(referencia_tabela='ItemPedidoCompra', tipo='ENTRADA').count(), 2)
+        self.assertEqual(list(Insumo.objects.order_by('id').values_list('quantidade_estoque', flat=True)), [10, 10])
+
+
+class ProcessarCustosPeriodoTests(TestCase):
+    def test_dia_lancado_por_execucao_concorrente_e_pulado(self):
+        produto = Produto.objects.create(nome='Caneta', preco=1)
+        movimento = MovimentoProdutoAcabado.objects.create(
+            produto=produto, tipo='ENTRADA', quantidade=100, custo_producao_unitario=1
+        )
+        # data_hora é auto_now_add
+        MovimentoProdutoAcabado.objects.filter(pk=movimento.pk).update(data_hora=timezone.make_aware(datetime(2025, 1, 1)))
+        # Lançamento do dia 2 feito por outra execução entre a verificação dos dias e a gravação desta
+        FluxoCaixa.objects.create(
+            tipo='SAIDA', categoria='OUTROS', descricao='Lançado em paralelo', valor=2,
+            data_lancamento=date(2025, 1, 2), referencia_tabela='CustoEstocagem', referencia_id=20250102
+        )
+
+        lancados = processar_custos_periodo(date(2025, 1, 1), date(2025, 1, 3))
+
+        self.assertEqual(sorted(lancados), [date(2025, 1, 1), date(2025, 1, 3)])
+        self.assertEqual(
+            sorted(CustoEstocagemProduto.objects.values_list('data', flat=True)), [date(2025, 1, 1), date(2025, 1, 3)]
+        )
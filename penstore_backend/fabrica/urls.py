@@ -20,4 +20,6 @@ router.register(r'logs-estoque', views.LogEstoqueDiarioViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('custos-diarios/processar/', views.ProcessarCustosEstoqueView.as_view(), name='processar-custos'),
+    path('estoque-em/', views.EstoqueEmDataView.as_view(), name='estoque-em'),
+    path('metricas/handlers/', views.MetricasHandlersView.as_view(), name='metricas-handlers'),
 ]
\ No newline at end of file
@@ -1,14 +1,19 @@
-from rest_framework import generics, permissions, status, viewsets
+from rest_framework import generics, permissions, serializers, status, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 from .models import (
     Fornecedor, Insumo, LogEstoqueDiario, Maquina,
     MovimentoInsumo, MovimentoProdutoAcabado, PedidoCompra,
     ItemPedidoCompra, OrdemProducao, ControleQualidade,
-    Venda, FluxoCaixa
+    Venda, FluxoCaixa, ResumoFluxoCaixa, SaldoCaixaDiario
 )
 from loja.models import Produto
 from .serializers import (
@@ -17,105 +22,253 @@ from .serializers import (
     PedidoCompraSerializer, ItemPedidoCompraSerializer, OrdemProducaoSerializer,
     ControleQualidadeSerializer, VendaSerializer, FluxoCaixaSerializer
 )
+from .custos import CustosJaProcessados, detalhamento_custo_estocagem, processar_custo_estocagem
+from .estoque import saldos_insumos, saldos_produtos
+from .instrumentacao import LIMITES_MS, histogramas
+from .pagination import (
+    PaginacaoCursor, PaginacaoPorDataHora, PaginacaoPorDataLancamento,
+    PaginacaoPorData, PaginacaoPorDataVenda, PaginacaoPorDataInspecao
+)
+
+def _parse_data(valor):
+    # parse_date levanta ValueError para datas no formato certo mas inexistentes (ex: 2026-02-30)
+    try:
+        return parse_date(valor)
+    except ValueError:
+        return None
+
+def _decimal(valor, casas=2):
+    # Mesmo formato dos DecimalField dos serializers (string); um Decimal cru sairia como float no JSON
+    return serializers.DecimalField(max_digits=None, decimal_places=casas).to_representation(valor)
 
 class FornecedorViewSet(viewsets.ModelViewSet):
     queryset = Fornecedor.objects.all()
     serializer_class = FornecedorSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class InsumoViewSet(viewsets.ModelViewSet):
-    queryset = Insumo.objects.all()
+    queryset = Insumo.objects.select_related('fornecedor')
     serializer_class = InsumoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class LogEstoqueDiarioViewSet(viewsets.ModelViewSet):
-    queryset = LogEstoqueDiario.objects.all()
+    queryset = LogEstoqueDiario.objects.select_related('insumo__fornecedor')
     serializer_class = LogEstoqueDiarioSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorData
+
+    def get_queryset(self):
+        # Tela de estoque diário: ?data=AAAA-MM-DD e/ou ?insumo=<id> sobre as linhas pré-calculadas
+        queryset = super().get_queryset()
+        dia = _parse_data(self.request.query_params.get('data') or '')
+        if dia:
+            queryset = queryset.filter(data=dia)
+        insumo_id = self.request.query_params.get('insumo')
+        if insumo_id and insumo_id.isdigit():
+            queryset = queryset.filter(insumo_id=insumo_id)
+        return queryset
 
 class MaquinaViewSet(viewsets.ModelViewSet):
     queryset = Maquina.objects.all()
     serializer_class = MaquinaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class MovimentoInsumoViewSet(viewsets.ModelViewSet):
-    queryset = MovimentoInsumo.objects.all()
+    queryset = MovimentoInsumo.objects.select_related('insumo__fornecedor')
     serializer_class = MovimentoInsumoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorDataHora
 
 class MovimentoProdutoAcabadoViewSet(viewsets.ModelViewSet):
-    queryset = MovimentoProdutoAcabado.objects.all()
+    queryset = MovimentoProdutoAcabado.objects.select_related('produto')
     serializer_class = MovimentoProdutoAcabadoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorDataHora
 
 class PedidoCompraViewSet(viewsets.ModelViewSet):
-    queryset = PedidoCompra.objects.all()
+    queryset = PedidoCompra.objects.select_related('fornecedor').prefetch_related('itens_pedido_compra__insumo__fornecedor')
     serializer_class = PedidoCompraSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class ItemPedidoCompraViewSet(viewsets.ModelViewSet):
-    queryset = ItemPedidoCompra.objects.all()
+    queryset = ItemPedidoCompra.objects.select_related('insumo__fornecedor')
     serializer_class = ItemPedidoCompraSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class OrdemProducaoViewSet(viewsets.ModelViewSet):
-    queryset = OrdemProducao.objects.all()
+    queryset = OrdemProducao.objects.select_related('maquina', 'funcionario')
     serializer_class = OrdemProducaoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
 
 class ControleQualidadeViewSet(viewsets.ModelViewSet):
-    queryset = ControleQualidade.objects.all()
+    queryset = ControleQualidade.objects.select_related('ordem_producao__maquina', 'ordem_producao__funcionario', 'inspetor')
     serializer_class = ControleQualidadeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorDataInspecao
 
 class VendaViewSet(viewsets.ModelViewSet):
-    queryset = Venda.objects.all()
+    queryset = Venda.objects.select_related('produto')
     serializer_class = VendaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorDataVenda
 
 class FluxoCaixaViewSet(viewsets.ModelViewSet):
     queryset = FluxoCaixa.objects.all()
     serializer_class = FluxoCaixaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoPorDataLancamento
+
+    @action(detail=False, methods=['get'])
+    def resumo(self, request):
+        """
+        Entradas, saídas e saldo a partir de ResumoFluxoCaixa (sem varrer os lançamentos).
+        ?agrupar=dia|mes|categoria (padrão: mes), ?de=AAAA-MM-DD, ?ate=AAAA-MM-DD, ?categoria=...
+        """
+        agrupar = request.query_params.get('agrupar', 'mes')
+        if agrupar not in ('dia', 'mes', 'categoria'):
+            return Response({"error": "Use agrupar=dia, mes ou categoria."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumos = ResumoFluxoCaixa.objects.all()
+        for parametro, filtro in (('de', 'data__gte'), ('ate', 'data__lte')):
+            valor = request.query_params.get(parametro)
+            if valor:
+                dia = _parse_data(valor)
+                if dia is None:
+                    return Response({"error": f"Data inválida em '{parametro}'. Use AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+                resumos = resumos.filter(**{filtro: dia})
+        categoria = request.query_params.get('categoria')
+        if categoria:
+            resumos = resumos.filter(categoria=categoria)
+
+        if agrupar == 'dia':
+            resumos = resumos.annotate(grupo=F('data'))
+        elif agrupar == 'mes':
+            resumos = resumos.annotate(grupo=TruncMonth('data'))
+        else:
+            resumos = resumos.annotate(grupo=F('categoria'))
+        totais = resumos.values('grupo').annotate(
+            entradas=Sum('entradas'), saidas=Sum('saidas'), lancamentos=Sum('lancamentos')
+        ).order_by('grupo')
+
+        return Response({
+            "agrupar": agrupar,
+            "resultados": [
+                {
+                    agrupar: total['grupo'],
+                    "entradas": _decimal(total['entradas']),
+                    "saidas": _decimal(total['saidas']),
+                    "saldo": _decimal(total['entradas'] - total['saidas']),
+                    "lancamentos": total['lancamentos'],
+                }
+                for total in totais
+            ]
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def saldo(self, request):
+        """Saldo de caixa acumulado no fechamento de ?data=AAAA-MM-DD (padrão: hoje), lido de SaldoCaixaDiario."""
+        valor = request.query_params.get('data')
+        dia = _parse_data(valor) if valor else timezone.localdate()
+        if dia is None:
+            return Response({"error": "Data inválida. Use AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"data": dia, "saldo": _decimal(SaldoCaixaDiario.saldo_em(dia))}, status=status.HTTP_200_OK)
 
 class ProcessarCustosEstoqueView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def _resposta(self, dia, message):
+        itens = list(detalhamento_custo_estocagem(dia))
+        return Response({
+            "message": message,
+            "data": dia,
+            "total": _decimal(sum((item.valor for item in itens), Decimal('0'))),
+            "detalhes": [
+                {"produto_id": item.produto_id, "produto": item.produto.nome, "quantidade": item.quantidade,
+                 "custo_unitario": _decimal(item.custo_unitario, 4), "valor": _decimal(item.valor)}
+                for item in itens
+            ]
+        }, status=status.HTTP_200_OK)
+
+    def get(self, request):
+        # Lê o detalhamento gravado, sem recalcular
+        valor_data = request.query_params.get('data')
+        dia = _parse_data(valor_data) if valor_data else timezone.localdate()
+        if dia is None:
+            return Response({"error": "Data inválida. Use AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        return self._resposta(dia, "Custos de estocagem registrados.")
+
     def post(self, request):
-        hoje = timezone.now().date()
-        
-        ja_processado = FluxoCaixa.objects.filter(
-            categoria='DEPRECIACAO',
-            data_lancamento=hoje,
-            descricao__startswith="Custo Diário de Estocagem"
-        ).exists()
-
-        if ja_processado:
+        hoje = timezone.localdate()
+        try:
+            itens = processar_custo_estocagem(hoje)
+        except CustosJaProcessados:
             return Response({"message": "Custos de hoje já foram processados."}, status=status.HTTP_400_BAD_REQUEST)
 
-        produtos = Produto.objects.all()
-        total_custo = 0
-        detalhes = []
-
-        for produto in produtos:
-            estoque = produto.estoque_atual
-            if estoque > 0:
-                custo_produto = estoque * 0.02 
-                total_custo += float(custo_produto)
-                detalhes.append(f"{produto.nome}: {estoque} un x 0.02")
-
-        if total_custo > 0:
-            FluxoCaixa.objects.create(
-                tipo='SAIDA',
-                categoria='DEPRECIACAO',
-                descricao=f"Custo Diário de Estocagem ({hoje})",
-                valor=total_custo,
-                data_lancamento=hoje
-            )
-            return Response({
-                "message": "Custos processados com sucesso.",
-                "total": total_custo,
-                "detalhes": detalhes
-            }, status=status.HTTP_200_OK)
-        
-        return Response({"message": "Estoque zerado, nenhum custo gerado."}, status=status.HTTP_200_OK)
\ No newline at end of file
+        if not itens:
+            return Response({"message": "Estoque zerado, nenhum custo gerado."}, status=status.HTTP_200_OK)
+        return self._resposta(hoje, "Custos processados com sucesso.")
+
+class EstoqueEmDataView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        tipo = request.query_params.get('tipo')
+        if tipo not in ('produto', 'insumo'):
+            return Response({"error": "Informe tipo=produto ou tipo=insumo."}, status=status.HTTP_400_BAD_REQUEST)
+
+        valor_data = request.query_params.get('data')
+        if valor_data:
+            # parse_datetime aceita uma data sem hora (meia-noite): a data pura precisa ser testada antes.
+            # Datas no formato certo mas inexistentes (2026-02-30) levantam ValueError.
+            try:
+                dia = parse_date(valor_data)
+                instante = None if dia else parse_datetime(valor_data)
+            except ValueError:
+                dia = instante = None
+            if dia is not None:
+                # Data sem hora: saldo de fechamento do dia
+                instante = datetime.combine(dia + timedelta(days=1), time.min)
+            elif instante is None:
+                return Response({"error": "Data inválida. Use AAAA-MM-DD ou ISO 8601."}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(instante):
+                instante = timezone.make_aware(instante)
+        else:
+            instante = timezone.now()
+
+        ids = None
+        item_id = request.query_params.get('id')
+        if item_id:
+            if not item_id.isdigit():
+                return Response({"error": "id inválido."}, status=status.HTTP_400_BAD_REQUEST)
+            ids = [int(item_id)]
+
+        if tipo == 'produto':
+            itens = Produto.objects.order_by('nome')
+            saldos = saldos_produtos(instante, ids)
+        else:
+            itens = Insumo.objects.order_by('nome')
+            saldos = saldos_insumos(instante, ids)
+        if ids is not None:
+            itens = itens.filter(pk__in=ids)
+
+        resultado = [
+            {"id": item_id, "nome": nome, "quantidade": saldos.get(item_id, 0)}
+            for item_id, nome in itens.values_list('id', 'nome')
+        ]
+        if ids is not None and not resultado:
+            return Response({"error": "Item não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"tipo": tipo, "data": instante, "itens": resultado}, status=status.HTTP_200_OK)
+
+class MetricasHandlersView(APIView):
+    """Histograma de duração e consultas dos signals e tarefas da fábrica neste processo."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"limites_ms": LIMITES_MS, "handlers": histogramas()}, status=status.HTTP_200_OK)
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Produto, Profile, Pedido, ItemPedido, Endereco
+from .models import Produto, Profile, Pedido, ItemPedido, Endereco, TarefaAgendada, EmailPendente
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
@@ -11,7 +12,8 @@ class ProdutoAdmin(admin.ModelAdmin):
         'preco_venda_unitario_fabrica'
     )
     search_fields = ('nome',)
-    readonly_fields = ('estoque_atual_admin',)
+    readonly_fields = ('estoque_atual_admin', 'fragmentos_estoque')
+    actions = ['ativar_estoque_fragmentado', 'desativar_estoque_fragmentado']
     
     fieldsets = (
         (None, {
@@ -21,15 +23,28 @@ class ProdutoAdmin(admin.ModelAdmin):
             'fields': ('custo_base_producao_unitario', 'preco_venda_unitario_fabrica')
         }),
         ('Estoque (Calculado)', {
-            'fields': ('estoque_atual_admin',)
+            'fields': ('estoque_atual_admin', 'fragmentos_estoque')
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_estoque()
+
     def estoque_atual_admin(self, obj):
         return obj.estoque_atual
     
     estoque_atual_admin.short_description = 'Estoque Atual'
 
+    @admin.action(description='Ativar estoque fragmentado (produtos muito disputados)')
+    def ativar_estoque_fragmentado(self, request, queryset):
+        for produto in queryset:
+            produto.definir_fragmentos_estoque(settings.ESTOQUE_FRAGMENTOS_PADRAO)
+
+    @admin.action(description='Desativar estoque fragmentado')
+    def desativar_estoque_fragmentado(self, request, queryset):
+        for produto in queryset.filter(fragmentos_estoque__gt=0):
+            produto.definir_fragmentos_estoque(0)
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'telefone')
@@ -54,4 +69,18 @@ class PedidoAdmin(admin.ModelAdmin):
 class EnderecoAdmin(admin.ModelAdmin):
     list_display = ('user', 'apelido', 'cep', 'cidade', 'estado', 'is_principal')
     list_filter = ('estado', 'is_principal')
-    search_fields = ('user__username', 'cep', 'rua', 'cidade')
\ No newline at end of file
+    search_fields = ('user__username', 'cep', 'rua', 'cidade')
+
+@admin.register(TarefaAgendada)
+class TarefaAgendadaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'executar_em', 'tentativas', 'concluida_em')
+    list_filter = ('status', 'tipo')
+    search_fields = ('tipo',)
+    readonly_fields = ('created_at', 'iniciada_em', 'concluida_em', 'ultimo_erro')
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'destinatario', 'assunto', 'status', 'tentativas', 'proxima_tentativa', 'enviado_em')
+    list_filter = ('status',)
+    search_fields = ('destinatario', 'assunto')
+    readonly_fields = ('created_at', 'enviado_em', 'ultimo_erro')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LojaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'loja'
+
+    def ready(self):
+        import loja.signals
+        import loja.tarefas
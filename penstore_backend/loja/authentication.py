@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def chave_cache_token(key):
+    return f'auth:token:{key}'
+
+
+def invalidar_token_cache(key):
+    cache.delete(chave_cache_token(key))
+
+
+def token_expirado(token):
+    validade = settings.AUTH_TOKEN_VALIDADE_HORAS
+    return bool(validade) and token.created < timezone.now() - timedelta(hours=validade)
+
+
+def invalidar_tokens_usuario(user_id):
+    cache.delete_many([chave_cache_token(key) for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True)])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que guarda o token (com o usuário já carregado) no cache por AUTH_TOKEN_CACHE_TTL
+    segundos. Logout, redefinição de senha e alterações no usuário removem a entrada (ver loja.signals);
+    a revogação só vale para todos os workers com um cache compartilhado em CACHE_URL.
+    Com AUTH_TOKEN_VALIDADE_HORAS definido, tokens mais antigos que isso são apagados e recusados.
+    """
+
+    def authenticate_credentials(self, key):
+        token = cache.get(chave_cache_token(key))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(chave_cache_token(key), token, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+
+        if token_expirado(token):
+            Token.objects.filter(key=key).delete()
+            invalidar_token_cache(key)
+            raise exceptions.AuthenticationFailed('Token expirado. Faça login novamente.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHAVE_VERSAO_CATALOGO = 'catalogo:versao'
+
+
+def versao_catalogo():
+    versao = cache.get(CHAVE_VERSAO_CATALOGO)
+    if versao is None:
+        # Valor inicial baseado no relógio: se a chave for despejada do cache, a nova versão
+        # não colide com respostas antigas ainda armazenadas.
+        cache.add(CHAVE_VERSAO_CATALOGO, time.time_ns(), timeout=None)
+        versao = cache.get(CHAVE_VERSAO_CATALOGO)
+    return versao
+
+
+def invalidar_catalogo():
+    try:
+        cache.incr(CHAVE_VERSAO_CATALOGO)
+    except ValueError:
+        cache.add(CHAVE_VERSAO_CATALOGO, time.time_ns(), timeout=None)
+
+
+def chave_catalogo(request, *partes, parametros=()):
+    # Só os parâmetros que a view usa entram na chave: ?x=<aleatório> não escapa do cache nem o enche
+    valores = '&'.join(f'{nome}={request.query_params.get(nome, "")}' for nome in sorted(parametros))
+    return ':'.join(['catalogo', str(versao_catalogo()), *map(str, partes), valores])
+
+
+def obter_ou_calcular(chave, calcular, timeout=None):
+    """
+    Lê `chave` do cache ou calcula o valor. Misses simultâneos são agrupados: apenas quem
+    obtém a trava (cache.add) recalcula, os demais aguardam o valor ficar disponível.
+    Se quem calculava falhar, a trava é liberada e o próximo a obtê-la recalcula.
+    """
+    timeout = settings.CATALOGO_CACHE_TTL if timeout is None else timeout
+    valor = cache.get(chave)
+    if valor is not None:
+        return valor
+
+    chave_trava = f'{chave}:trava'
+    limite = time.monotonic() + settings.CATALOGO_CACHE_TRAVA_TTL
+    while time.monotonic() < limite:
+        if cache.add(chave_trava, 1, timeout=settings.CATALOGO_CACHE_TRAVA_TTL):
+            try:
+                valor = calcular()
+                cache.set(chave, valor, timeout=timeout)
+            finally:
+                cache.delete(chave_trava)
+            return valor
+        time.sleep(0.05)
+        valor = cache.get(chave)
+        if valor is not None:
+            return valor
+    return calcular()
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailPendente
+
+
+def enfileirar_email(assunto, corpo, destinatario):
+    """Grava o email na caixa de saída; deve ser chamado na mesma transação da operação que o origina."""
+    return EmailPendente.objects.create(assunto=assunto, corpo=corpo, destinatario=destinatario)
+
+
+def enviar_emails_pendentes(limite=100):
+    """
+    Envia um lote da caixa de saída abrindo uma única conexão SMTP. Falhas são reagendadas com backoff
+    exponencial até EMAIL_MAX_TENTATIVAS. Retorna (enviados, falhas).
+    """
+    enviados = falhas = 0
+    with transaction.atomic():
+        pendentes = list(
+            EmailPendente.objects.select_for_update(skip_locked=True).filter(
+                status='pendente', proxima_tentativa__lte=timezone.now()
+            ).order_by('proxima_tentativa', 'id')[:limite]
+        )
+        if not pendentes:
+            return enviados, falhas
+
+        with get_connection(fail_silently=False) as conexao:
+            for email in pendentes:
+                mensagem = EmailMessage(
+                    email.assunto, email.corpo, settings.EMAIL_HOST_USER, [email.destinatario], connection=conexao
+                )
+                email.tentativas += 1
+                try:
+                    conexao.send_messages([mensagem])
+                except Exception as e:
+                    falhas += 1
+                    email.ultimo_erro = str(e)
+                    if email.tentativas >= settings.EMAIL_MAX_TENTATIVAS:
+                        email.status = 'falhou'
+                    else:
+                        email.proxima_tentativa = timezone.now() + timedelta(seconds=60 * 2 ** email.tentativas)
+                else:
+                    enviados += 1
+                    email.status = 'enviado'
+                    email.enviado_em = timezone.now()
+
+        EmailPendente.objects.bulk_update(
+            pendentes, ['status', 'tentativas', 'proxima_tentativa', 'enviado_em', 'ultimo_erro']
+        )
+    return enviados, falhas
@@ -0,0 +1,66 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from loja.models import Produto
+
+class Command(BaseCommand):
+    help = 'Compara a vazão de reservas de estoque (checkout) entre o contador único e o estoque fragmentado. Cria produtos temporários e os remove ao final.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--reservas', type=int, default=2000, help='Total de reservas de 1 unidade por modo.')
+        parser.add_argument('--fragmentos', type=int, default=settings.ESTOQUE_FRAGMENTOS_PADRAO)
+        parser.add_argument(
+            '--espera-ms', type=float, default=5,
+            help='Tempo que cada transação segura a reserva antes do commit, simulando o restante do checkout.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("AVISO: o SQLite serializa todas as escritas; rode contra o PostgreSQL para um resultado representativo."))
+
+        threads, reservas = options['threads'], options['reservas']
+        for modo, fragmentos in (('Contador único', 0), (f"{options['fragmentos']} fragmentos", options['fragmentos'])):
+            produto = Produto.objects.create(nome=f'__benchmark_estoque_{uuid.uuid4().hex[:8]}', preco=0)
+            try:
+                Produto.objects.filter(pk=produto.pk).update(quantidade_estoque=reservas)
+                if fragmentos:
+                    produto.definir_fragmentos_estoque(fragmentos)
+
+                sucesso, erros = [], []
+                def trabalhador(quantidade):
+                    try:
+                        for _ in range(quantidade):
+                            try:
+                                with transaction.atomic():
+                                    if Produto.objects.reservar_estoque({produto.pk: 1}) is None:
+                                        sucesso.append(1)
+                                    time.sleep(options['espera_ms'] / 1000)
+                            except DatabaseError:
+                                erros.append(1)
+                    finally:
+                        connection.close()
+
+                base, resto = divmod(reservas, threads)
+                trabalhadores = [
+                    threading.Thread(target=trabalhador, args=(base + (1 if i < resto else 0),))
+                    for i in range(threads)
+                ]
+                inicio = time.perf_counter()
+                for t in trabalhadores:
+                    t.start()
+                for t in trabalhadores:
+                    t.join()
+                duracao = time.perf_counter() - inicio
+
+                saldo_final = Produto.objects.com_estoque().get(pk=produto.pk).estoque_atual
+                self.stdout.write(
+                    f"{modo}: {len(sucesso)} reservas em {duracao:.2f}s "
+                    f"({len(sucesso) / duracao:.0f} reservas/s), {len(erros)} erros de banco, saldo final {saldo_final}"
+                )
+            finally:
+                produto.delete()
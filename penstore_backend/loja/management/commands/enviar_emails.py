@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from loja.emails import enviar_emails_pendentes
+
+class Command(BaseCommand):
+    help = 'Envia os emails da caixa de saída em lotes, reutilizando uma conexão SMTP por lote. Use --loop para rodar como worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help='Máximo de emails por conexão SMTP.')
+        parser.add_argument('--loop', action='store_true', help='Continua rodando, consultando a caixa de saída periodicamente.')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera quando não há emails (com --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                enviados, falhas = enviar_emails_pendentes(options['lote'])
+            except Exception as e:
+                # Falha ao abrir a conexão SMTP: nenhum email foi marcado, o lote será tentado de novo
+                self.stdout.write(self.style.ERROR(f"ERRO ao conectar ao servidor de email: {e}"))
+                enviados, falhas = 0, 0
+            if enviados or falhas:
+                self.stdout.write(f"{enviados} email(s) enviado(s), {falhas} falha(s).")
+            if not options['loop']:
+                break
+            if enviados + falhas < options['lote']:
+                time.sleep(options['intervalo'])
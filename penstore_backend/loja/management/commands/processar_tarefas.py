@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from loja.tarefas import processar_tarefas
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas agendadas vencidas (ex: simulação de entrega de pedidos). Use --loop para rodar como worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Máximo de tarefas reservadas por rodada.')
+        parser.add_argument('--loop', action='store_true', help='Continua rodando, consultando a fila periodicamente.')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera quando a fila está vazia (com --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            processadas = processar_tarefas(options['lote'])
+            if processadas:
+                self.stdout.write(f"{processadas} tarefa(s) processada(s).")
+            if not options['loop']:
+                break
+            if processadas < options['lote']:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:35
+
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Sum, When
+
+
+def popular_quantidade_estoque(apps, schema_editor):
+    Produto = apps.get_model('loja', 'Produto')
+    MovimentoProdutoAcabado = apps.get_model('fabrica', 'MovimentoProdutoAcabado')
+    saldos = MovimentoProdutoAcabado.objects.values('produto_id').annotate(
+        saldo=Sum(Case(
+            When(tipo='ENTRADA', then=F('quantidade')),
+            When(tipo='SAIDA', then=-F('quantidade')),
+            default=0,
+            output_field=IntegerField(),
+        ))
+    ).values_list('produto_id', 'saldo')
+    for produto_id, saldo in saldos:
+        Produto.objects.filter(pk=produto_id).update(quantidade_estoque=saldo or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0006_profile_email_otp_profile_email_otp_created_at_and_more'),
+        ('fabrica', '0007_composicaoproduto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='quantidade_estoque',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(popular_quantidade_estoque, migrations.RunPython.noop),
+    ]
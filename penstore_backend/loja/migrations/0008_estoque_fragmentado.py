@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0007_produto_quantidade_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='fragmentos_estoque',
+            field=models.PositiveSmallIntegerField(default=0, help_text='0 = saldo em quantidade_estoque; N > 0 = saldo dividido em N fragmentos (produtos muito disputados)'),
+        ),
+        migrations.CreateModel(
+            name='FragmentoEstoqueProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('quantidade', models.IntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='loja.produto')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Estoque',
+                'verbose_name_plural': 'Fragmentos de Estoque',
+                'unique_together': {('produto', 'indice')},
+            },
+        ),
+    ]
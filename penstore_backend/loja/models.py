@@ -1,28 +1,156 @@
-from django.db import models
+import random
+
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class ProdutoQuerySet(models.QuerySet):
+    def com_estoque(self):
+        # Soma dos fragmentos na mesma consulta; só é lida para produtos com estoque fragmentado
+        soma_fragmentos = FragmentoEstoqueProduto.objects.filter(produto=OuterRef('pk')).values('produto').annotate(
+            total=Sum('quantidade')
+        ).values('total')
+        return self.annotate(estoque_fragmentos=Coalesce(Subquery(soma_fragmentos), 0))
+
+    def com_estoque_calculado(self):
+        # Saldo derivado do histórico em um único JOIN + GROUP BY (ENTRADA soma, SAIDA subtrai)
+        return self.annotate(
+            estoque_calculado=Coalesce(Sum(Case(
+                When(movimentos_produto_acabado__tipo='ENTRADA', then=F('movimentos_produto_acabado__quantidade')),
+                When(movimentos_produto_acabado__tipo='SAIDA', then=-F('movimentos_produto_acabado__quantidade')),
+                default=0,
+                output_field=IntegerField(),
+            )), 0)
+        )
+
+    def aplicar_deltas(self, deltas):
+        """
+        Soma {produto_id: delta} ao saldo. Produtos comuns recebem um único UPDATE com CASE; produtos com
+        estoque fragmentado recebem o delta em um fragmento sorteado.
+        """
+        deltas = {produto_id: delta for produto_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        atualizados = self.filter(pk__in=deltas, fragmentos_estoque=0).update(
+            quantidade_estoque=F('quantidade_estoque') + Case(
+                *[When(pk=produto_id, then=Value(delta)) for produto_id, delta in deltas.items()],
+                default=Value(0),
+            )
+        )
+        if atualizados == len(deltas):
+            return
+        for produto_id, n in self.filter(pk__in=deltas, fragmentos_estoque__gt=0).values_list('pk', 'fragmentos_estoque'):
+            FragmentoEstoqueProduto.objects.filter(produto_id=produto_id, indice=random.randrange(n)).update(
+                quantidade=F('quantidade') + deltas[produto_id]
+            )
+
+    def reservar_estoque(self, quantidades):
+        """
+        Debita {produto_id: quantidade} com UPDATEs condicionais (quantidade_estoque >= pedido), em ordem de id
+        para que checkouts concorrentes travem as linhas sempre na mesma sequência. Deve rodar dentro de uma
+        transação; retorna o id do primeiro produto sem saldo (o chamador desfaz a transação) ou None.
+        """
+        for produto_id in sorted(quantidades):
+            quantidade = quantidades[produto_id]
+            reservado = self.filter(pk=produto_id, fragmentos_estoque=0, quantidade_estoque__gte=quantidade).update(
+                quantidade_estoque=F('quantidade_estoque') - quantidade
+            )
+            if not reservado:
+                n = self.filter(pk=produto_id).values_list('fragmentos_estoque', flat=True).first()
+                if not n or not FragmentoEstoqueProduto.objects.reservar(produto_id, n, quantidade):
+                    return produto_id
+        return None
 
 class Produto(models.Model):
+    CAMPOS_ESTOQUE = ('quantidade_estoque', 'fragmentos_estoque')
+
     nome = models.CharField(max_length=255)
     preco = models.DecimalField(max_digits=10, decimal_places=2) 
     
     custo_base_producao_unitario = models.DecimalField(max_digits=10, decimal_places=4, default=0.0000)
     preco_venda_unitario_fabrica = models.DecimalField(max_digits=10, decimal_places=4, default=0.0000)
 
+    quantidade_estoque = models.IntegerField(default=0)
+    fragmentos_estoque = models.PositiveSmallIntegerField(
+        default=0, help_text="0 = saldo em quantidade_estoque; N > 0 = saldo dividido em N fragmentos (produtos muito disputados)"
+    )
+
+    objects = ProdutoQuerySet.as_manager()
+
     def __str__(self): return self.nome
+
+    def save(self, *args, **kwargs):
+        # O saldo é mantido pelos movimentos via F(); não sobrescrever com o valor em memória
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_ESTOQUE
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def estoque_atual(self):
-        from fabrica.models import MovimentoProdutoAcabado 
-
-        entradas = self.movimentos_produto_acabado.filter(tipo='ENTRADA').aggregate(
-            total=models.Sum('quantidade')
-        )['total'] or 0
-        
-        saidas = self.movimentos_produto_acabado.filter(tipo='SAIDA').aggregate(
-            total=models.Sum('quantidade')
-        )['total'] or 0
-        
-        return entradas - saidas
+        if not self.fragmentos_estoque:
+            return self.quantidade_estoque
+        if hasattr(self, 'estoque_fragmentos'):
+            return self.estoque_fragmentos
+        return self.fragmentos.aggregate(total=Sum('quantidade'))['total'] or 0
+
+    def definir_fragmentos_estoque(self, n, total=None):
+        """Redistribui o saldo (ou `total`, se informado) em `n` fragmentos; n=0 volta para o contador único."""
+        with transaction.atomic():
+            produto = Produto.objects.select_for_update().get(pk=self.pk)
+            fragmentos = FragmentoEstoqueProduto.objects.select_for_update().filter(produto=produto)
+            if total is None:
+                total = produto.quantidade_estoque + (fragmentos.aggregate(total=Sum('quantidade'))['total'] or 0)
+            fragmentos.delete()
+            if n:
+                base, resto = divmod(total, n)
+                FragmentoEstoqueProduto.objects.bulk_create([
+                    FragmentoEstoqueProduto(produto=produto, indice=i, quantidade=base + (1 if i < resto else 0))
+                    for i in range(n)
+                ])
+            Produto.objects.filter(pk=self.pk).update(quantidade_estoque=0 if n else total, fragmentos_estoque=n)
+        self.quantidade_estoque, self.fragmentos_estoque = (0 if n else total), n
+
+class FragmentoEstoqueQuerySet(models.QuerySet):
+    def reservar(self, produto_id, n, quantidade):
+        inicio = random.randrange(n)
+        # Caminho rápido: um fragmento sorteado cobre a quantidade inteira
+        if self.filter(produto_id=produto_id, indice=inicio, quantidade__gte=quantidade).update(
+            quantidade=F('quantidade') - quantidade
+        ):
+            return True
+
+        # Transbordo: trava os fragmentos do produto (em ordem de índice) e consome de vários
+        fragmentos = list(self.select_for_update().filter(produto_id=produto_id).order_by('indice'))
+        if sum(f.quantidade for f in fragmentos) < quantidade:
+            return False
+        restante = quantidade
+        for fragmento in fragmentos[inicio:] + fragmentos[:inicio]:
+            retirar = min(max(fragmento.quantidade, 0), restante)
+            if retirar:
+                self.filter(pk=fragmento.pk).update(quantidade=F('quantidade') - retirar)
+                restante -= retirar
+            if not restante:
+                break
+        return True
+
+class FragmentoEstoqueProduto(models.Model):
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='fragmentos')
+    indice = models.PositiveSmallIntegerField()
+    quantidade = models.IntegerField(default=0)
+
+    objects = FragmentoEstoqueQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('produto', 'indice')
+        verbose_name = "Fragmento de Estoque"
+        verbose_name_plural = "Fragmentos de Estoque"
+
+    def __str__(self): return f"{self.produto.nome} #{self.indice}: {self.quantidade}"
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE) 
@@ -87,4 +215,51 @@ class Endereco(models.Model):
         unique_together = ('user', 'apelido') 
 
     def __str__(self):
-        return f"{self.apelido} ({self.user.username}) - {self.rua}, {self.numero}"
\ No newline at end of file
+        return f"{self.apelido} ({self.user.username}) - {self.rua}, {self.numero}"
+
+class TarefaAgendada(models.Model):
+    STATUS_CHOICES = (
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou')
+    )
+    tipo = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    executar_em = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    iniciada_em = models.DateTimeField(blank=True, null=True)
+    concluida_em = models.DateTimeField(blank=True, null=True)
+    ultimo_erro = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Tarefa Agendada"
+        verbose_name_plural = "Tarefas Agendadas"
+        indexes = [models.Index(fields=['status', 'executar_em'], name='tarefa_status_executar_idx')]
+
+    def __str__(self): return f'{self.tipo} #{self.id} ({self.status})'
+
+class EmailPendente(models.Model):
+    STATUS_CHOICES = (
+        ('pendente', 'Pendente'),
+        ('enviado', 'Enviado'),
+        ('falhou', 'Falhou')
+    )
+    destinatario = models.EmailField()
+    assunto = models.CharField(max_length=255)
+    corpo = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    enviado_em = models.DateTimeField(blank=True, null=True)
+    ultimo_erro = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Email Pendente"
+        verbose_name_plural = "Emails Pendentes"
+        indexes = [models.Index(fields=['status', 'proxima_tentativa'], name='email_status_tentativa_idx')]
+
+    def __str__(self): return f'{self.assunto} -> {self.destinatario} ({self.status})'
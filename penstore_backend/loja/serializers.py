@@ -2,10 +2,10 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Produto, Profile, Pedido, ItemPedido, Endereco
 from django.db import transaction
+from collections import defaultdict
 import random
 from django.utils import timezone
-from django.core.mail import send_mail
-from django.conf import settings
+from .emails import enfileirar_email
 
 class RegisterSerializer(serializers.ModelSerializer):
     password_confirm = serializers.CharField(style={'input_type': 'password'}, write_only=True)
@@ -31,33 +31,27 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm') 
         
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email', ''), 
-            password=validated_data['password']
-        )
-        user.is_active = False
-        user.save()
-        
-        otp = str(random.randint(100000, 999999))
-        Profile.objects.create(
-            user=user,
-            email_otp=otp,
-            email_otp_created_at=timezone.now()
-        )
-        
-        try:
-            send_mail(
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data['username'],
+                email=validated_data.get('email', ''), 
+                password=validated_data['password']
+            )
+            user.is_active = False
+            user.save()
+            
+            otp = str(random.randint(100000, 999999))
+            Profile.objects.create(
+                user=user,
+                email_otp=otp,
+                email_otp_created_at=timezone.now()
+            )
+            
+            enfileirar_email(
                 'Seu código de verificação - BluePen',
                 f'Bem-vindo à BluePen! Seu código de verificação é: {otp}',
-                settings.EMAIL_HOST_USER,
-                [user.email],
-                fail_silently=False,
+                user.email,
             )
-        except Exception as e:
-            user.delete() 
-            print(f"ERRO DE EMAIL NO RENDER: {str(e)}") 
-            raise serializers.ValidationError({"email": "Falha na conexão com o servidor de email. A conta não foi criada."})
             
         return user
 
@@ -68,7 +62,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'username', 'is_superuser']
 
 class ProdutoSerializer(serializers.ModelSerializer):
-    estoque = serializers.IntegerField(source='estoque_atual', read_only=True) 
+    estoque = serializers.IntegerField(source='estoque_atual', read_only=True)
 
     class Meta:
         model = Produto
@@ -84,11 +78,14 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'telefone', 'data_nascimento', 'is_2fa_enabled', 'is_email_verified']
         read_only_fields = ['id', 'user', 'is_2fa_enabled', 'is_email_verified']
 
+class ProdutoResumoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Produto
+        fields = ['id', 'nome', 'preco']
+
 class ItemPedidoSerializer(serializers.ModelSerializer):
-    produto_id = serializers.PrimaryKeyRelatedField(
-        queryset=Produto.objects.all(), source='produto', write_only=True
-    )
-    produto = ProdutoSerializer(read_only=True) 
+    produto_id = serializers.IntegerField(write_only=True)
+    produto = ProdutoResumoSerializer(read_only=True) 
     class Meta:
         model = ItemPedido
         fields = ['id', 'produto', 'produto_id', 'quantidade', 'preco_unitario']
@@ -107,46 +104,73 @@ class PedidoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'total_pedido', 'status', 'created_at']
 
+    def validate_itens(self, itens):
+        # Carrega todos os produtos do pedido (e o saldo de cada um) em uma única consulta
+        ids = {item['produto_id'] for item in itens}
+        produtos = Produto.objects.com_estoque().in_bulk(ids)
+        inexistentes = ids - produtos.keys()
+        if inexistentes:
+            raise serializers.ValidationError(f'Produto(s) inexistente(s): {", ".join(map(str, sorted(inexistentes)))}.')
+
+        quantidades = defaultdict(int)
+        for item in itens:
+            item['produto'] = produtos[item.pop('produto_id')]
+            if item['quantidade'] <= 0:
+                raise serializers.ValidationError(f'Quantidade inválida para {item["produto"].nome}.')
+            quantidades[item['produto'].id] += item['quantidade']
+
+        for produto_id, quantidade in quantidades.items():
+            produto = produtos[produto_id]
+            if produto.estoque_atual < quantidade:
+                raise serializers.ValidationError(
+                    f'Estoque insuficiente para {produto.nome}. Disponível: {produto.estoque_atual}, Solicitado: {quantidade}'
+                )
+        return itens
+
     def create(self, validated_data):
+        from fabrica.models import MovimentoProdutoAcabado
+
         itens_data = validated_data.pop('itens') 
+        validated_data['total_pedido'] = sum(item['produto'].preco * item['quantidade'] for item in itens_data)
+
+        quantidades = defaultdict(int)
+        produtos = {}
+        for item_data in itens_data:
+            produtos[item_data['produto'].id] = item_data['produto']
+            quantidades[item_data['produto'].id] += item_data['quantidade']
+
         with transaction.atomic():
+            # A checagem em validate_itens é só uma leitura; a reserva condicional é o que impede vender além do saldo
+            sem_saldo = Produto.objects.reservar_estoque(quantidades)
+            if sem_saldo is not None:
+                produto = produtos[sem_saldo]
+                disponivel = Produto.objects.com_estoque().get(pk=sem_saldo).estoque_atual
+                raise serializers.ValidationError({'itens': [
+                    f'Estoque insuficiente para {produto.nome}. Disponível: {disponivel}, Solicitado: {quantidades[sem_saldo]}'
+                ]})
+
             pedido = Pedido.objects.create(**validated_data) 
-            total_calculado = 0
-            try: 
-                for item_data in itens_data:
-                    produto = item_data['produto'] 
-                    quantidade = item_data['quantidade']
-                    if quantidade <= 0:
-                         raise serializers.ValidationError(f'Quantidade inválida para {produto.nome}.')
-                    if produto.estoque_atual < quantidade: 
-                        raise serializers.ValidationError(
-                            f'Estoque insuficiente para {produto.nome}. Disponível: {produto.estoque_atual}, Solicitado: {quantidade}'
-                        )
-                    from fabrica.models import MovimentoProdutoAcabado
-                    MovimentoProdutoAcabado.objects.create(
-                        produto=produto,
-                        tipo='SAIDA',
-                        quantidade=quantidade,
-                        custo_producao_unitario=produto.custo_base_producao_unitario,
-                        referencia_tabela='Pedido Loja',
-                        referencia_id=pedido.id
-                    )
-                    
-                    ItemPedido.objects.create(
-                        pedido=pedido, 
-                        produto=produto, 
-                        quantidade=quantidade,
-                        preco_unitario=produto.preco 
-                    )
-                    
-                    total_calculado += (produto.preco * quantidade)
-                pedido.total_pedido = total_calculado
-                pedido.save(update_fields=['total_pedido']) 
-            except serializers.ValidationError as e:
-                raise e 
-            except Exception as e:
-                 pedido.delete()
-                 raise serializers.ValidationError("Erro interno ao processar itens do pedido.")
+            movimentos = [
+                MovimentoProdutoAcabado(
+                    produto=produtos[produto_id],
+                    tipo='SAIDA',
+                    quantidade=quantidade,
+                    custo_producao_unitario=produtos[produto_id].custo_base_producao_unitario,
+                    referencia_tabela='Pedido Loja',
+                    referencia_id=pedido.id
+                )
+                for produto_id, quantidade in quantidades.items()
+            ]
+            MovimentoProdutoAcabado.objects.registrar_em_lote(movimentos, atualizar_estoque=False)
+            ItemPedido.objects.bulk_create([
+                ItemPedido(
+                    pedido=pedido, 
+                    produto=item_data['produto'], 
+                    quantidade=item_data['quantidade'],
+                    preco_unitario=item_data['produto'].preco 
+                )
+                for item_data in itens_data
+            ])
         return pedido
 
 class PedidoAdminSerializer(serializers.ModelSerializer):
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from .authentication import invalidar_token_cache, invalidar_tokens_usuario
+from .cache import invalidar_catalogo
+from .models import Produto
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+@receiver(post_save, sender='fabrica.MovimentoProdutoAcabado')
+@receiver(post_delete, sender='fabrica.MovimentoProdutoAcabado')
+def invalidar_cache_catalogo(sender, **kwargs):
+    transaction.on_commit(invalidar_catalogo)
+
+@receiver(post_delete, sender=Token)
+def invalidar_cache_token(sender, instance, **kwargs):
+    # key é a PK do Token e é zerada pelo delete() antes do commit
+    key = instance.key
+    transaction.on_commit(lambda: invalidar_token_cache(key))
+
+@receiver(post_save, sender=User)
+def invalidar_cache_tokens_usuario(sender, instance, created, **kwargs):
+    # O token em cache carrega o usuário; qualquer alteração (is_active, senha, permissões) precisa ser refletida
+    if not created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: invalidar_tokens_usuario(user_id))
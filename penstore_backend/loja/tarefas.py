@@ -0,0 +1,93 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Pedido, TarefaAgendada
+
+logger = logging.getLogger(__name__)
+
+_tarefas = {}
+
+
+def tarefa(tipo):
+    """Registra a função como executora das tarefas do `tipo` informado."""
+    def registrar(funcao):
+        _tarefas[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def agendar(tipo, payload=None, executar_em=None, atraso=None):
+    if tipo not in _tarefas:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+    if settings.TAREFAS_SINCRONAS and executar_em is None and atraso is None:
+        # Modo para testes/desenvolvimento: executa na hora, dentro da transação de quem agendou
+        with transaction.atomic():
+            _tarefas[tipo](**(payload or {}))
+        return None
+    if executar_em is None:
+        executar_em = timezone.now() + (atraso or timedelta())
+    return TarefaAgendada.objects.create(tipo=tipo, payload=payload or {}, executar_em=executar_em)
+
+
+def _reservar_lote(limite):
+    """
+    Marca até `limite` tarefas vencidas como 'executando'. FOR UPDATE SKIP LOCKED deixa vários workers
+    disputarem a fila sem bloquear uns aos outros; tarefas presas em 'executando' (worker que morreu)
+    voltam a ser elegíveis depois de TAREFAS_TIMEOUT_SEGUNDOS.
+    """
+    agora = timezone.now()
+    expiradas = agora - timedelta(seconds=settings.TAREFAS_TIMEOUT_SEGUNDOS)
+    with transaction.atomic():
+        ids = list(
+            TarefaAgendada.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pendente', executar_em__lte=agora) | Q(status='executando', iniciada_em__lt=expiradas)
+            ).order_by('executar_em', 'id').values_list('id', flat=True)[:limite]
+        )
+        TarefaAgendada.objects.filter(pk__in=ids).update(
+            status='executando', iniciada_em=agora, tentativas=F('tentativas') + 1
+        )
+        # Lidas na mesma transação: se a leitura falhar, a reserva é desfeita e as tarefas não ficam presas
+        return list(TarefaAgendada.objects.filter(pk__in=ids).order_by('executar_em', 'id'))
+
+
+def processar_tarefas(limite=50):
+    """Executa um lote de tarefas vencidas e retorna quantas foram processadas."""
+    tarefas = _reservar_lote(limite)
+    for tarefa_agendada in tarefas:
+        executar = _tarefas.get(tarefa_agendada.tipo)
+        try:
+            if executar is None:
+                raise LookupError(f'Tipo de tarefa desconhecido: {tarefa_agendada.tipo}')
+            with transaction.atomic():
+                executar(**tarefa_agendada.payload)
+        except Exception:
+            tarefa_agendada.ultimo_erro = traceback.format_exc()
+            if tarefa_agendada.tentativas >= settings.TAREFAS_MAX_TENTATIVAS:
+                tarefa_agendada.status = 'falhou'
+                logger.error(
+                    'Tarefa %s #%s falhou após %s tentativas.',
+                    tarefa_agendada.tipo, tarefa_agendada.id, tarefa_agendada.tentativas, exc_info=True
+                )
+            else:
+                tarefa_agendada.status = 'pendente'
+                tarefa_agendada.executar_em = timezone.now() + timedelta(seconds=30 * 2 ** tarefa_agendada.tentativas)
+            tarefa_agendada.save(update_fields=['status', 'executar_em', 'ultimo_erro'])
+        else:
+            tarefa_agendada.status = 'concluida'
+            tarefa_agendada.concluida_em = timezone.now()
+            tarefa_agendada.save(update_fields=['status', 'concluida_em'])
+    return len(tarefas)
+
+
+@tarefa('pedido.marcar_entregue')
+def marcar_pedido_entregue(pedido_id):
+    pedido = Pedido.objects.select_for_update().filter(pk=pedido_id).first()
+    if pedido and pedido.status == 'enviado':
+        pedido.status = 'entregue'
+        pedido.save(update_fields=['status'])
@@ -1,3 +1,234 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import CachedTokenAuthentication
+from .models import FragmentoEstoqueProduto, Produto, TarefaAgendada
+from .tarefas import _reservar_lote, agendar, processar_tarefas, tarefa
+
+execucoes = []
+
+
+@tarefa('teste.registrar')
+def registrar_execucao(chave):
+    execucoes.append(chave)
+
+
+@tarefa('teste.falhar')
+def falhar():
+    raise RuntimeError('falha de teste')
+
+
+class ReservaEstoqueConcorrenteTests(TransactionTestCase):
+    """Checkouts simultâneos disputando pouco estoque: nenhuma venda além do saldo."""
+
+    threads = 40
+
+    def _disputar(self, produto_id, quantidade):
+        sucessos = []
+        largada = threading.Barrier(self.threads)
+
+        def reservar():
+            try:
+                largada.wait()
+                for _ in range(200):
+                    try:
+                        with transaction.atomic():
+                            if Produto.objects.reservar_estoque({produto_id: quantidade}) is None:
+                                sucessos.append(quantidade)
+                        return
+                    except OperationalError:
+                        # SQLite recusa escritores simultâneos ("database table is locked"): tenta de novo
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reservar) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(sucessos)
+
+    def _saldo(self, produto_id):
+        return Produto.objects.com_estoque().get(pk=produto_id).estoque_atual
+
+    def test_contador_unico_nao_vende_alem_do_saldo(self):
+        produto = Produto.objects.create(nome='Caneta', preco=1, quantidade_estoque=10)
+
+        self.assertEqual(self._disputar(produto.pk, 1), 10)
+        self.assertEqual(self._saldo(produto.pk), 0)
+
+    def test_estoque_fragmentado_nao_vende_alem_do_saldo(self):
+        produto = Produto.objects.create(nome='Caneta', preco=1, quantidade_estoque=10)
+        produto.definir_fragmentos_estoque(4)
+
+        self.assertEqual(self._disputar(produto.pk, 1), 10)
+        self.assertEqual(self._saldo(produto.pk), 0)
+        self.assertFalse(FragmentoEstoqueProduto.objects.filter(produto=produto, quantidade__lt=0).exists())
+
+    def test_transbordo_entre_fragmentos_nao_vende_alem_do_saldo(self):
+        # Fragmentos de 2 ou 3 unidades e pedidos de 3: boa parte das reservas passa pelo transbordo
+        produto = Produto.objects.create(nome='Caneta', preco=1, quantidade_estoque=20)
+        produto.definir_fragmentos_estoque(8)
+
+        self.assertEqual(self._disputar(produto.pk, 3), 6)
+        self.assertEqual(self._saldo(produto.pk), 2)
+        self.assertFalse(FragmentoEstoqueProduto.objects.filter(produto=produto, quantidade__lt=0).exists())
+
+
+@override_settings(AUTH_TOKEN_VALIDADE_HORAS=1)
+class TokenAutenticacaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='senha-forte-123')
+        self.token = Token.objects.create(user=self.user)
+        self.autenticacao = CachedTokenAuthentication()
+
+    def _vencer_token(self):
+        Token.objects.filter(user=self.user).update(created=timezone.now() - timedelta(hours=2))
+
+    def test_token_em_cache_nao_consulta_o_banco(self):
+        self.autenticacao.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, _ = self.autenticacao.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+    def test_token_expirado_e_recusado_e_apagado(self):
+        self._vencer_token()
+
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'Token expirado'):
+            self.autenticacao.authenticate_credentials(self.token.key)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_token_apagado_sai_do_cache(self):
+        self.autenticacao.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(key=self.token.key).delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.autenticacao.authenticate_credentials(self.token.key)
+
+    def test_usuario_desativado_com_token_em_cache_e_recusado(self):
+        self.autenticacao.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'User inactive'):
+            self.autenticacao.authenticate_credentials(self.token.key)
+
+    def test_login_depois_da_expiracao_gera_token_novo(self):
+        client = APIClient()
+        credenciais = {'username': 'cliente', 'password': 'senha-forte-123'}
+        self.assertEqual(client.post('/api/login/', credenciais).data['token'], self.token.key)
+
+        self._vencer_token()
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = client.post('/api/login/', credenciais).data['token']
+
+        self.assertNotEqual(novo, self.token.key)
+        user, _ = self.autenticacao.authenticate_credentials(novo)
+        self.assertEqual(user, self.user)
+
+
+@override_settings(TAREFAS_SINCRONAS=False, TAREFAS_MAX_TENTATIVAS=3)
+class FilaTarefasTests(TestCase):
+    def setUp(self):
+        execucoes.clear()
+
+    def test_falha_volta_para_a_fila_com_backoff(self):
+        tarefa_agendada = agendar('teste.falhar')
+
+        antes = timezone.now()
+        # Falha que ainda será reexecutada não é erro definitivo
+        with self.assertNoLogs('loja.tarefas', 'ERROR'):
+            self.assertEqual(processar_tarefas(), 1)
+        tarefa_agendada.refresh_from_db()
+        self.assertEqual((tarefa_agendada.status, tarefa_agendada.tentativas), ('pendente', 1))
+        self.assertGreaterEqual(tarefa_agendada.executar_em, antes + timedelta(seconds=60))
+        self.assertIn('falha de teste', tarefa_agendada.ultimo_erro)
+
+        # Ainda não venceu: a próxima rodada não a pega
+        self.assertEqual(processar_tarefas(), 0)
+
+        TarefaAgendada.objects.filter(pk=tarefa_agendada.pk).update(executar_em=timezone.now())
+        antes = timezone.now()
+        processar_tarefas()
+        tarefa_agendada.refresh_from_db()
+        self.assertEqual((tarefa_agendada.status, tarefa_agendada.tentativas), ('pendente', 2))
+        self.assertGreaterEqual(tarefa_agendada.executar_em, antes + timedelta(seconds=120))
+
+        TarefaAgendada.objects.filter(pk=tarefa_agendada.pk).update(executar_em=timezone.now())
+        with self.assertLogs('loja.tarefas', 'ERROR') as logs:
+            processar_tarefas()
+        tarefa_agendada.refresh_from_db()
+        self.assertEqual((tarefa_agendada.status, tarefa_agendada.tentativas), ('falhou', 3))
+        self.assertIn('falhou após 3 tentativas', logs.output[0])
+
+    def test_modo_sincrono_executa_na_hora(self):
+        with self.settings(TAREFAS_SINCRONAS=True):
+            self.assertIsNone(agendar('teste.registrar', {'chave': 'agora'}))
+            # Com atraso, a tarefa continua indo para a fila
+            agendar('teste.registrar', {'chave': 'depois'}, atraso=timedelta(minutes=5))
+
+        self.assertEqual(execucoes, ['agora'])
+        self.assertEqual(list(TarefaAgendada.objects.values_list('payload', flat=True)), [{'chave': 'depois'}])
+
+
+@override_settings(TAREFAS_SINCRONAS=False)
+class ReservaLoteTarefasConcorrenteTests(TransactionTestCase):
+    """Vários workers disputando a fila: cada tarefa é reservada uma única vez."""
+
+    workers = 6
+    tarefas = 60
+
+    def test_workers_concorrentes_nao_reservam_a_mesma_tarefa(self):
+        for indice in range(self.tarefas):
+            agendar('teste.registrar', {'chave': indice})
+        largada = threading.Barrier(self.workers)
+        reservadas = []
+        erros = []
+
+        def trabalhar():
+            try:
+                largada.wait()
+                for tentativa in range(500):
+                    try:
+                        lote = _reservar_lote(5)
+                    except OperationalError:
+                        # SQLite recusa escritores simultâneos ("database table is locked"): espera e tenta de novo
+                        time.sleep(random.uniform(0, 0.002 * (tentativa + 1)))
+                        continue
+                    if not lote:
+                        return
+                    reservadas.extend(tarefa_agendada.payload['chave'] for tarefa_agendada in lote)
+                raise AssertionError("Fila não esvaziada após 500 rodadas.")
+            except Exception as e:
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabalhar) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertEqual(Counter(reservadas), Counter(range(self.tarefas)))
+        self.assertFalse(TarefaAgendada.objects.exclude(status='executando', tentativas=1).exists())
@@ -6,12 +6,10 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
 from django.utils import timezone
 from django.conf import settings
 
-import threading
-import time
+from datetime import timedelta
 import pyotp
 import random
 
@@ -27,6 +25,10 @@ from .serializers import (
     EnderecoSerializer
 )
 from fabrica.models import MovimentoProdutoAcabado 
+from .authentication import token_expirado
+from .cache import chave_catalogo, obter_ou_calcular
+from .emails import enfileirar_email
+from .tarefas import agendar
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -73,17 +75,16 @@ class RequestPasswordResetOTPView(APIView):
             profile = Profile.objects.get(user=user)
             
             otp = str(random.randint(100000, 999999))
-            profile.email_otp = otp
-            profile.email_otp_created_at = timezone.now()
-            profile.save()
-            
-            send_mail(
-                'Recuperação de Senha - BluePen',
-                f'Seu código para redefinir a senha é: {otp}. Ele expira em 10 minutos.',
-                settings.EMAIL_HOST_USER,
-                [user.email],
-                fail_silently=False,
-            )
+            with transaction.atomic():
+                profile.email_otp = otp
+                profile.email_otp_created_at = timezone.now()
+                profile.save()
+                
+                enfileirar_email(
+                    'Recuperação de Senha - BluePen',
+                    f'Seu código para redefinir a senha é: {otp}. Ele expira em 10 minutos.',
+                    user.email,
+                )
             return Response({'message': 'Código enviado para o email'}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({'message': 'Se o email existir, um código foi enviado.'}, status=status.HTTP_200_OK)
@@ -106,6 +107,7 @@ class ResetPasswordWithOTPView(APIView):
             
             user.set_password(new_password)
             user.save()
+            Token.objects.filter(user=user).delete()
             
             profile.email_otp = None
             profile.email_otp_created_at = None
@@ -143,6 +145,10 @@ class CustomLoginView(APIView):
                     return Response({'error': 'Código 2FA inválido'}, status=status.HTTP_400_BAD_REQUEST)
 
             token, created = Token.objects.get_or_create(user=user)
+            if not created and token_expirado(token):
+                # O token vencido seria recusado já na próxima requisição: troca por um novo
+                token.delete()
+                token = Token.objects.create(user=user)
             return Response({
                 'token': token.key,
                 'user_id': user.pk,
@@ -209,8 +215,10 @@ class DisableTOTPView(APIView):
         return Response({'message': '2FA desativado com sucesso'})
 
 class ProdutoViewSet(viewsets.ModelViewSet):
-    queryset = Produto.objects.all().order_by('nome')
+    queryset = Produto.objects.com_estoque().order_by('nome')
     serializer_class = ProdutoSerializer
+    # Parâmetros de consulta que alteram a listagem (nenhum por enquanto)
+    parametros_catalogo = ()
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -219,6 +227,20 @@ class ProdutoViewSet(viewsets.ModelViewSet):
             self.permission_classes = [permissions.AllowAny]
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        dados = obter_ou_calcular(
+            chave_catalogo(request, 'lista', parametros=self.parametros_catalogo),
+            lambda: list(super(ProdutoViewSet, self).list(request, *args, **kwargs).data),
+        )
+        return Response(dados)
+
+    def retrieve(self, request, *args, **kwargs):
+        dados = obter_ou_calcular(
+            chave_catalogo(request, 'detalhe', kwargs[self.lookup_field]),
+            lambda: dict(super(ProdutoViewSet, self).retrieve(request, *args, **kwargs).data),
+        )
+        return Response(dados)
+
 class ProfileViewSet(viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
@@ -252,13 +274,16 @@ class PedidoViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        pedidos = Pedido.objects.select_related('user').prefetch_related('itens__produto').order_by('-created_at')
         if self.request.user.is_superuser:
-            return Pedido.objects.all().order_by('-created_at')
-        return Pedido.objects.filter(user=self.request.user).order_by('-created_at')
+            return pedidos
+        return pedidos.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         with transaction.atomic():
             serializer.save(user=self.request.user)
+        # Recarrega com os itens pré-carregados para a resposta não consultar item a item
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -269,33 +294,24 @@ class PedidoViewSet(viewsets.ModelViewSet):
             
         return PedidoSerializer
 
-    def _marcar_como_entregue(self, pedido_id):
-        try:
-            time.sleep(60)
-            pedido = Pedido.objects.get(id=pedido_id)
-            if pedido.status == 'enviado':
-                pedido.status = 'entregue'
-                pedido.save(update_fields=['status'])
-        except Pedido.DoesNotExist:
-            pass
-        except Exception as e:
-            pass
-
     def update(self, request, *args, **kwargs):
         if not request.user.is_superuser:
             return Response(status=status.HTTP_403_FORBIDDEN)
             
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        novo_status = request.data.get('status')
+        status_anterior = instance.status
 
-        if novo_status == 'enviado' and instance.status != 'enviado':
-            timer = threading.Timer(120.0, self._marcar_como_entregue, [instance.id])
-            timer.start()
-        
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        with transaction.atomic():
+            self.perform_update(serializer)
+            if instance.status == 'enviado' and status_anterior != 'enviado':
+                agendar(
+                    'pedido.marcar_entregue',
+                    {'pedido_id': instance.id},
+                    atraso=timedelta(seconds=settings.PEDIDO_ENTREGA_SIMULADA_SEGUNDOS)
+                )
 
         if getattr(instance, '_prefetched_objects_cache', None):
             instance._prefetched_objects_cache = {}
@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from datetime import timedelta
+from decimal import Decimal
 import environ 
 
 env = environ.Env(
@@ -8,7 +9,14 @@ env = environ.Env(
     CLOUDINARY_URL=(str, ''),
     DATABASE_URL=(str, 'sqlite:///db.sqlite3'),
     EMAIL_HOST_USER=(str, ''),
-    EMAIL_HOST_PASSWORD=(str, '')
+    EMAIL_HOST_PASSWORD=(str, ''),
+    EMAIL_BACKEND=(str, 'django.core.mail.backends.smtp.EmailBackend'),
+    CACHE_URL=(str, 'locmemcache://'),
+    CATALOGO_CACHE_TTL=(int, None),
+    AUTH_TOKEN_CACHE_TTL=(int, None),
+    AUTH_TOKEN_VALIDADE_HORAS=(int, 0),
+    TAREFAS_SINCRONAS=(bool, False),
+    FABRICA_LOG_LEVEL=(str, 'INFO')
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -77,6 +85,51 @@ DATABASES = {
     'default': env.db('DATABASE_URL')
 }
 
+CACHES = {
+    'default': env.cache('CACHE_URL')
+}
+CACHE_COMPARTILHADO = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# A invalidação do catálogo (nova versão via cache.incr) só alcança os outros workers com cache compartilhado;
+# com o cache local, cada worker serve a listagem antiga até o TTL vencer.
+CATALOGO_CACHE_TTL = env('CATALOGO_CACHE_TTL')
+if CATALOGO_CACHE_TTL is None:
+    CATALOGO_CACHE_TTL = 300 if CACHE_COMPARTILHADO else 5
+CATALOGO_CACHE_TRAVA_TTL = 5
+
+ESTOQUE_FRAGMENTOS_PADRAO = 8
+
+# Folga entre o corte de um snapshot de estoque e a sua geração: movimentos com data_hora anterior ao corte
+# ainda podem estar sendo gravados por transações abertas
+ESTOQUE_SNAPSHOT_FOLGA = timedelta(minutes=10)
+
+# Custo diário de estocagem por unidade (produtos acabados e insumos)
+CUSTO_ESTOCAGEM_UNITARIO = Decimal('0.02')
+
+TAREFAS_MAX_TENTATIVAS = 5
+TAREFAS_TIMEOUT_SEGUNDOS = 600
+TAREFAS_SINCRONAS = env('TAREFAS_SINCRONAS')
+
+# FABRICA_LOG_LEVEL=DEBUG liga o registro por chamada dos handlers de fabrica/instrumentacao.py
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'padrao': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'padrao'},
+    },
+    'loggers': {
+        'fabrica': {'handlers': ['console'], 'level': env('FABRICA_LOG_LEVEL'), 'propagate': False},
+        'loja.tarefas': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+PEDIDO_ENTREGA_SIMULADA_SEGUNDOS = 180
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -131,7 +184,7 @@ CORS_ALLOWED_ORIGINS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'loja.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication', 
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -139,14 +192,24 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Logout e desativação só removem o token do cache do processo que atendeu a requisição quando o cache é
+# local (locmem): os outros workers aceitariam o token revogado até o TTL vencer. Sem cache compartilhado
+# (Redis/Memcached em CACHE_URL) o padrão é de poucos segundos; com ele, 5 minutos.
+AUTH_TOKEN_CACHE_TTL = env('AUTH_TOKEN_CACHE_TTL')
+if AUTH_TOKEN_CACHE_TTL is None:
+    AUTH_TOKEN_CACHE_TTL = 300 if CACHE_COMPARTILHADO else 5
+# 0 = tokens sem expiração
+AUTH_TOKEN_VALIDADE_HORAS = env('AUTH_TOKEN_VALIDADE_HORAS')
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = env('EMAIL_BACKEND')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
\ No newline at end of file
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
+EMAIL_MAX_TENTATIVAS = 5